@@ -0,0 +1,147 @@
+import base64
+import hashlib
+import logging
+import os
+import re
+import threading
+from xml.etree import ElementTree
+
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from django.conf import settings
+
+LOG = logging.getLogger(__name__)
+
+x509_backend = default_backend()
+
+METADATA_NAMESPACE = 'urn:oasis:names:tc:SAML:2.0:metadata'
+XMLDSIG_NAMESPACE = 'http://www.w3.org/2000/09/xmldsig#'
+
+
+class EmbeddedCertificateSource(object):
+    """
+    Key source for a certificate embedded in the code.
+    """
+    def __init__(self, certificate):
+        """
+        :type certificate: str
+        :param certificate: Base64 encoded DER certificate
+        """
+        self.certificates = [certificate]
+
+    def get_certificates(self):
+        return self.certificates
+
+
+class SettingsCertificateSource(object):
+    """
+    Key source for certificates listed in the settings.
+
+    The certificates are read from the ADFS_SIGNING_CERTIFICATES setting,
+    which maps provider ids to lists of base64 encoded DER or PEM
+    certificates.
+    """
+    def __init__(self, provider_id):
+        self.provider_id = provider_id
+
+    def get_certificates(self):
+        return settings.ADFS_SIGNING_CERTIFICATES.get(self.provider_id, [])
+
+
+class MetadataFileCertificateSource(object):
+    """
+    Key source for the signing certificates of a federation metadata file.
+
+    The file is re-read only when its modification time changes, so a
+    rotated certificate can be taken into use by replacing the file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._mtime = None
+        self._certificates = []
+        self._lock = threading.Lock()
+
+    def get_certificates(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            LOG.warning('Cannot read ADFS metadata file %s', self.path)
+            return []
+        with self._lock:
+            if mtime != self._mtime:
+                with open(self.path, 'rb') as metadata_file:
+                    self._certificates = parse_metadata_certificates(
+                        metadata_file.read())
+                self._mtime = mtime
+            return self._certificates
+
+
+def parse_metadata_certificates(metadata):
+    """
+    Parse the signing certificates from a federation metadata document.
+
+    :type metadata: bytes
+    :rtype: list[str]
+    :return: Base64 encoded DER certificates
+    """
+    root = ElementTree.fromstring(metadata)
+    certificates = []
+    for key_descriptor in root.iter('{%s}KeyDescriptor' % METADATA_NAMESPACE):
+        if key_descriptor.get('use', 'signing') != 'signing':
+            continue
+        for cert in key_descriptor.iter('{%s}X509Certificate' % XMLDSIG_NAMESPACE):
+            certificate = _normalize_certificate(cert.text or '')
+            if certificate and certificate not in certificates:
+                certificates.append(certificate)
+    return certificates
+
+
+_public_keys = {}
+_public_keys_lock = threading.Lock()
+
+
+def get_public_key(certificate):
+    """
+    Get the public key of a certificate.
+
+    The parsed keys are cached in the process by the certificate
+    fingerprint, so each certificate is parsed only once.
+
+    :type certificate: str
+    :param certificate: Base64 encoded DER or PEM certificate
+    :rtype: cryptography.hazmat.primitives.asymmetric.rsa.RSAPublicKey
+    """
+    cert_der = base64.b64decode(_normalize_certificate(certificate))
+    fingerprint = hashlib.sha256(cert_der).hexdigest()
+    public_key = _public_keys.get(fingerprint)
+    if public_key is None:
+        x509_cert = x509.load_der_x509_certificate(cert_der, backend=x509_backend)
+        public_key = x509_cert.public_key()
+        with _public_keys_lock:
+            _public_keys[fingerprint] = public_key
+    return public_key
+
+
+def get_verification_keys(key_sources):
+    """
+    Get the public keys of the certificates of given key sources.
+
+    :type key_sources: Iterable
+    :param key_sources: Objects with a get_certificates method
+    :rtype: list
+    """
+    keys = []
+    seen = set()
+    for source in key_sources:
+        for certificate in source.get_certificates():
+            certificate = _normalize_certificate(certificate)
+            if certificate in seen:
+                continue
+            seen.add(certificate)
+            keys.append(get_public_key(certificate))
+    return keys
+
+
+def _normalize_certificate(certificate):
+    certificate = re.sub(r'-----(BEGIN|END) CERTIFICATE-----', '', certificate)
+    return ''.join(certificate.split())
@@ -0,0 +1,206 @@
+import base64
+import datetime
+import os
+from unittest import mock
+
+import jwt
+import pytest
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from django.test import RequestFactory
+
+from adfs_provider import keys, views
+from adfs_provider.keys import (
+    EmbeddedCertificateSource, MetadataFileCertificateSource, SettingsCertificateSource, get_public_key,
+    get_verification_keys, parse_metadata_certificates
+)
+from adfs_provider.views import HelsinkiADFSOAuth2Adapter
+
+METADATA_TEMPLATE = """<?xml version="1.0" encoding="utf-8"?>
+<EntityDescriptor xmlns="urn:oasis:names:tc:SAML:2.0:metadata" entityID="http://fs.example.com/adfs/services/trust">
+  <RoleDescriptor>
+    {}
+  </RoleDescriptor>
+</EntityDescriptor>
+"""
+
+KEY_DESCRIPTOR_TEMPLATE = """<KeyDescriptor use="{}">
+      <KeyInfo xmlns="http://www.w3.org/2000/09/xmldsig#">
+        <X509Data><X509Certificate>{}</X509Certificate></X509Data>
+      </KeyInfo>
+    </KeyDescriptor>"""
+
+
+class SigningKey(object):
+    def __init__(self):
+        self.private_key = rsa.generate_private_key(
+            public_exponent=65537, key_size=2048, backend=default_backend())
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'ADFS Signing')])
+        now = datetime.datetime.utcnow()
+        x509_cert = x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(
+            self.private_key.public_key()
+        ).serial_number(1).not_valid_before(now).not_valid_after(
+            now + datetime.timedelta(days=1)
+        ).sign(self.private_key, hashes.SHA256(), default_backend())
+        self.certificate = base64.b64encode(x509_cert.public_bytes(serialization.Encoding.DER)).decode('ascii')
+        self.pem_certificate = x509_cert.public_bytes(serialization.Encoding.PEM).decode('ascii')
+
+    def sign(self, payload):
+        return jwt.encode(payload, self.private_key, algorithm='RS256').decode('ascii')
+
+    def public_numbers(self):
+        return self.private_key.public_key().public_numbers()
+
+
+@pytest.fixture(scope='module')
+def signing_key():
+    return SigningKey()
+
+
+@pytest.fixture(scope='module')
+def other_signing_key():
+    return SigningKey()
+
+
+@pytest.fixture(autouse=True)
+def clear_key_caches():
+    keys._public_keys.clear()
+    views._metadata_sources.clear()
+
+
+def get_metadata(*key_descriptors):
+    return METADATA_TEMPLATE.format(''.join(
+        KEY_DESCRIPTOR_TEMPLATE.format(use, certificate)
+        for (use, certificate) in key_descriptors
+    )).encode('utf-8')
+
+
+def write_metadata(path, mtime, *key_descriptors):
+    path.write_binary(get_metadata(*key_descriptors))
+    os.utime(str(path), (mtime, mtime))
+
+
+def get_adapter():
+    return HelsinkiADFSOAuth2Adapter(RequestFactory().get('/'))
+
+
+def test_parse_metadata_certificates(signing_key, other_signing_key):
+    wrapped_certificate = '\n'.join(
+        signing_key.certificate[i:i + 64] for i in range(0, len(signing_key.certificate), 64))
+    metadata = get_metadata(
+        ('signing', wrapped_certificate),
+        ('encryption', other_signing_key.certificate),
+        ('signing', signing_key.certificate),
+    )
+
+    assert parse_metadata_certificates(metadata) == [signing_key.certificate]
+
+
+def test_metadata_file_source(tmpdir, signing_key, other_signing_key):
+    path = tmpdir.join('metadata.xml')
+    write_metadata(path, 1000000, ('signing', signing_key.certificate))
+    source = MetadataFileCertificateSource(str(path))
+
+    assert source.get_certificates() == [signing_key.certificate]
+
+    with mock.patch('adfs_provider.keys.parse_metadata_certificates') as parse_mock:
+        assert source.get_certificates() == [signing_key.certificate]
+    assert not parse_mock.called
+
+    # A replaced file is read again
+    write_metadata(path, 2000000, ('signing', other_signing_key.certificate))
+    assert source.get_certificates() == [other_signing_key.certificate]
+
+
+def test_metadata_file_source_missing_file(tmpdir):
+    source = MetadataFileCertificateSource(str(tmpdir.join('missing.xml')))
+
+    assert source.get_certificates() == []
+
+
+def test_settings_source(settings, signing_key):
+    settings.ADFS_SIGNING_CERTIFICATES = {'helsinki_adfs': [signing_key.pem_certificate]}
+
+    assert SettingsCertificateSource('helsinki_adfs').get_certificates() == [signing_key.pem_certificate]
+    assert SettingsCertificateSource('espoo_adfs').get_certificates() == []
+
+
+def test_get_verification_keys(signing_key, other_signing_key):
+    key_sources = [
+        EmbeddedCertificateSource(signing_key.pem_certificate),
+        EmbeddedCertificateSource(signing_key.certificate),
+        EmbeddedCertificateSource(other_signing_key.certificate),
+    ]
+
+    public_keys = get_verification_keys(key_sources)
+
+    assert [key.public_numbers() for key in public_keys] == [
+        signing_key.public_numbers(), other_signing_key.public_numbers()]
+
+
+def test_get_public_key_is_cached_by_fingerprint(signing_key, other_signing_key):
+    with mock.patch('adfs_provider.keys.x509.load_der_x509_certificate',
+                    wraps=x509.load_der_x509_certificate) as load_mock:
+        public_key = get_public_key(signing_key.certificate)
+        assert get_public_key(signing_key.pem_certificate) is public_key
+        assert load_mock.call_count == 1
+
+        get_public_key(other_signing_key.certificate)
+        assert load_mock.call_count == 2
+
+
+def test_get_key_sources(settings, tmpdir, signing_key):
+    path = tmpdir.join('metadata.xml')
+    write_metadata(path, 1000000, ('signing', signing_key.certificate))
+    settings.ADFS_SIGNING_CERTIFICATES = {}
+    settings.ADFS_METADATA_FILES = {'helsinki_adfs': str(path)}
+
+    key_sources = get_adapter().get_key_sources()
+
+    assert [type(source) for source in key_sources] == [
+        SettingsCertificateSource, MetadataFileCertificateSource, EmbeddedCertificateSource]
+    assert key_sources[1].get_certificates() == [signing_key.certificate]
+    assert key_sources[2].get_certificates() == [HelsinkiADFSOAuth2Adapter.cert]
+    # The metadata source, and so its parsed certificates, is shared
+    assert get_adapter().get_key_sources()[1] is key_sources[1]
+
+
+def test_decode_token_falls_back_to_next_key(settings, signing_key, other_signing_key):
+    settings.ADFS_SIGNING_CERTIFICATES = {
+        'helsinki_adfs': [other_signing_key.certificate, signing_key.certificate],
+    }
+    settings.ADFS_METADATA_FILES = {}
+    token = signing_key.sign({'sub': 'test-user'})
+
+    assert get_adapter().decode_token(token) == {'sub': 'test-user'}
+
+
+def test_decode_token_from_metadata_file(settings, tmpdir, signing_key):
+    path = tmpdir.join('metadata.xml')
+    write_metadata(path, 1000000, ('signing', signing_key.certificate))
+    settings.ADFS_SIGNING_CERTIFICATES = {}
+    settings.ADFS_METADATA_FILES = {'helsinki_adfs': str(path)}
+    token = signing_key.sign({'sub': 'test-user'})
+
+    assert get_adapter().decode_token(token) == {'sub': 'test-user'}
+
+
+def test_decode_token_fails_with_all_keys(settings, signing_key, other_signing_key):
+    settings.ADFS_SIGNING_CERTIFICATES = {'helsinki_adfs': [other_signing_key.certificate]}
+    settings.ADFS_METADATA_FILES = {}
+    token = signing_key.sign({'sub': 'test-user'})
+
+    with pytest.raises(jwt.DecodeError):
+        get_adapter().decode_token(token)
+
+
+def test_decode_token_without_keys(signing_key):
+    adapter = get_adapter()
+    token = signing_key.sign({'sub': 'test-user'})
+
+    with mock.patch.object(adapter, 'get_key_sources', return_value=[]):
+        with pytest.raises(jwt.DecodeError):
+            adapter.decode_token(token)
@@ -1,13 +1,15 @@
-import base64
-
 import jwt
-from allauth.socialaccount.providers.oauth2.views import OAuth2Adapter, OAuth2CallbackView, OAuth2LoginView
-from cryptography import x509
-from cryptography.hazmat.backends import default_backend
+from allauth.socialaccount.providers.oauth2.views import OAuth2Adapter, OAuth2LoginView
+from django.conf import settings
+
+from tunnistamo.upstream import PooledOAuth2CallbackView
 
+from .keys import (
+    EmbeddedCertificateSource, MetadataFileCertificateSource, SettingsCertificateSource, get_verification_keys
+)
 from .provider import EspooADFSProvider, HelsinkiADFSProvider
 
-x509_backend = default_backend()
+_metadata_sources = {}
 
 
 class ADFSOAuth2Adapter(OAuth2Adapter):
@@ -17,16 +19,39 @@ class ADFSOAuth2Adapter(OAuth2Adapter):
 
     @classmethod
     def get_callback_view(cls):
-        return OAuth2CallbackView.adapter_view(cls)
+        return PooledOAuth2CallbackView.adapter_view(cls)
+
+    def get_key_sources(self):
+        """
+        Get the sources of the token signing certificates.
+
+        Certificates from the settings and from a configured metadata
+        file are tried before the certificate embedded in the adapter.
+        """
+        sources = [SettingsCertificateSource(self.provider_id)]
+        metadata_path = settings.ADFS_METADATA_FILES.get(self.provider_id)
+        if metadata_path:
+            if metadata_path not in _metadata_sources:
+                _metadata_sources[metadata_path] = MetadataFileCertificateSource(metadata_path)
+            sources.append(_metadata_sources[metadata_path])
+        sources.append(EmbeddedCertificateSource(self.cert))
+        return sources
 
     def complete_login(self, request, app, token, **kwargs):
-        cert_der = base64.b64decode(self.cert)
-        x509_cert = x509.load_der_x509_certificate(cert_der, backend=x509_backend)
-        jwt_token = jwt.decode(token.token, key=x509_cert.public_key(),
-                               leeway=10, options={'verify_aud': False})
+        jwt_token = self.decode_token(token.token)
         data = self.clean_attributes(jwt_token)
         return self.get_provider().sociallogin_from_response(request, data)
 
+    def decode_token(self, token):
+        error = jwt.DecodeError('No signing keys for {}'.format(self.provider_id))
+        for key in get_verification_keys(self.get_key_sources()):
+            try:
+                return jwt.decode(token, key=key, leeway=10, options={'verify_aud': False})
+            except jwt.DecodeError as exc:
+                # Signed with another key, e.g. during certificate rotation
+                error = exc
+        raise error
+
 
 class HelsinkiADFSOAuth2Adapter(ADFSOAuth2Adapter):
     provider_id = HelsinkiADFSProvider.id
@@ -0,0 +1 @@
+pytest_plugins = ['tunnistamo.tests.query_budget']
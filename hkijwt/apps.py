@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.translation import ugettext_lazy as _
+
+
+class HkiJwtConfig(AppConfig):
+    name = 'hkijwt'
+    verbose_name = _('Helsinki JWT')
+
+    def ready(self):
+        # Register signal handlers
+        from . import signals  # noqa
@@ -0,0 +1,58 @@
+import hashlib
+
+from django.utils import timezone
+
+from tunnistamo.cache import bump_version, get_cache, get_version
+from users.cache import get_user_version
+
+APPS_VERSION = 'hkijwt.apps'
+
+
+def get_cached_jwt(access_token, target_app_id):
+    """
+    Get a cached JWT issued with given access token for a target app.
+
+    :type access_token: oauth2_provider.models.AccessToken
+    :type target_app_id: str
+    :param target_app_id: Client id of the target app, or empty string
+    :rtype: dict|None
+    :return: The cached response data, if any
+    """
+    return get_cache().get(_get_cache_key(access_token, target_app_id))
+
+
+def cache_jwt(access_token, target_app_id, data):
+    """
+    Cache a JWT issued with given access token until the token expires.
+
+    :type access_token: oauth2_provider.models.AccessToken
+    :type target_app_id: str
+    :type data: dict
+    :param data: The response data containing the JWT
+    """
+    timeout = int((access_token.expires - timezone.now()).total_seconds())
+    if timeout > 0:
+        get_cache().set(
+            _get_cache_key(access_token, target_app_id), data,
+            timeout=timeout)
+
+
+def invalidate_apps():
+    """
+    Invalidate JWTs cached for all apps.
+
+    Should be called when the applications or the app-to-app
+    permissions change.
+    """
+    bump_version(APPS_VERSION)
+
+
+def _get_cache_key(access_token, target_app_id):
+    key_data = '\n'.join([
+        access_token.token,
+        target_app_id,
+        str(get_user_version(access_token.user_id)),
+        str(get_version(APPS_VERSION)),
+    ])
+    key_hash = hashlib.sha256(key_data.encode('utf-8')).hexdigest()
+    return 'hkijwt:jwt:{}'.format(key_hash)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def remove_duplicate_permissions(apps, schema_editor):
+    AppToAppPermission = apps.get_model('hkijwt', 'AppToAppPermission')
+    seen = set()
+    duplicate_ids = []
+    permissions = AppToAppPermission.objects.order_by('id').values_list('id', 'requester_id', 'target_id')
+    for (permission_id, requester_id, target_id) in permissions:
+        if (requester_id, target_id) in seen:
+            duplicate_ids.append(permission_id)
+        seen.add((requester_id, target_id))
+    AppToAppPermission.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hkijwt', '0003_remove_api_etc'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_permissions, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='apptoapppermission',
+            unique_together=set([('requester', 'target')]),
+        ),
+    ]
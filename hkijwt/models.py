@@ -8,5 +8,8 @@ class AppToAppPermission(models.Model):
     target = models.ForeignKey(settings.OAUTH2_PROVIDER_APPLICATION_MODEL,
                                db_index=True, related_name='+', on_delete=models.CASCADE)
 
+    class Meta:
+        unique_together = [('requester', 'target')]
+
     def __str__(self):
         return "%s -> %s" % (self.requester, self.target)
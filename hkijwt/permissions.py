@@ -0,0 +1,73 @@
+from collections import defaultdict
+
+from tunnistamo.cache import VersionedValue
+
+from .cache import APPS_VERSION
+from .models import AppToAppPermission
+
+
+class AppToAppPermissionMatrix(object):
+    """
+    In-memory matrix of the app-to-app permissions.
+    """
+    def __init__(self, targets_by_requester):
+        """
+        :type targets_by_requester: dict[int,frozenset[int]]
+        :param targets_by_requester:
+          Ids of the allowed target apps by the requester app id
+        """
+        self.targets_by_requester = targets_by_requester
+
+    @classmethod
+    def load(cls):
+        """
+        Load the permission matrix from the database.
+
+        :rtype: AppToAppPermissionMatrix
+        """
+        targets = defaultdict(set)
+        permissions = AppToAppPermission.objects.values_list(
+            'requester_id', 'target_id')
+        for (requester_id, target_id) in permissions:
+            targets[requester_id].add(target_id)
+        return cls({
+            requester_id: frozenset(target_ids)
+            for (requester_id, target_ids) in targets.items()
+        })
+
+    def is_allowed(self, requester_id, target_id):
+        """
+        Check if the requester app may request tokens for the target app.
+
+        :type requester_id: int
+        :type target_id: int
+        :rtype: bool
+        """
+        return target_id in self.targets_by_requester.get(
+            requester_id, frozenset())
+
+
+# The matrix shares the version with the cached JWTs, since both must be
+# invalidated when the permissions change
+_matrix = VersionedValue(APPS_VERSION, AppToAppPermissionMatrix.load)
+
+
+def get_permission_matrix():
+    """
+    Get an up-to-date app-to-app permission matrix.
+
+    :rtype: AppToAppPermissionMatrix
+    """
+    return _matrix.get()
+
+
+def has_app_to_app_permission(requester_app, target_app):
+    """
+    Check if the requester app may request tokens for the target app.
+
+    :type requester_app: users.models.Application
+    :type target_app: users.models.Application
+    :rtype: bool
+    """
+    return get_permission_matrix().is_allowed(
+        requester_app.pk, target_app.pk)
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from oauth2_provider.models import get_application_model
+
+from .cache import invalidate_apps
+from .models import AppToAppPermission
+
+Application = get_application_model()
+
+
+@receiver([post_save, post_delete], sender=AppToAppPermission)
+@receiver([post_save, post_delete], sender=Application)
+def invalidate_apps_on_change(sender, **kwargs):
+    invalidate_apps()
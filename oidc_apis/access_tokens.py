@@ -0,0 +1,304 @@
+"""
+Self-contained (JWT) access tokens.
+
+Clients which have the jwt_access_tokens option enabled get a signed JWT
+as their access token from the token endpoint.  The JWTs have the
+"at+jwt" type, so that they can't be mistaken for ID Tokens.  The "jti"
+claim of the JWT is a hash of the opaque access token stored in the
+database, which is resolved through the shared cache, or by the subject
+and the client if the cache entry is gone.  Tunnistamo's own endpoints
+verify the JWTs locally and check only a revocation list in the shared
+cache, which holds the tokens that were deleted before their expiry.
+"""
+import base64
+import datetime
+import hashlib
+import json
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import cached_property
+from oidc_provider.lib.errors import BearerTokenError
+from oidc_provider.lib.utils.common import get_issuer
+from oidc_provider.lib.utils.oauth2 import extract_access_token
+from oidc_provider.lib.utils.oauth2 import protected_resource_view as oidc_protected_resource_view
+from oidc_provider.models import Client, Token
+
+from tunnistamo.cache import VersionedValue, get_cache
+from users.login_methods import LOGIN_METHODS_VERSION
+from users.models import OidcClientOptions
+
+from .registry import get_api_scope_registry
+from .signing import encode_id_token, sign_rs256, verify_rs256
+from .utils import get_client_credentials
+
+ACCESS_TOKEN_TYPE = 'at+jwt'
+
+
+class LocalAccessToken(object):
+    """
+    Access token verified from a JWT.
+
+    Has the attributes of oidc_provider's Token needed for generating
+    the API tokens.  The user and the client are loaded only if used.
+    """
+    def __init__(self, access_token, scope, user_id, client_id, expires_at):
+        self.access_token = access_token
+        self.scope = scope
+        self.user_id = user_id
+        self.client_id = client_id
+        self.expires_at = expires_at
+
+    @cached_property
+    def user(self):
+        return get_user_model().objects.get(pk=self.user_id)
+
+    @cached_property
+    def client(self):
+        return Client.objects.get(pk=self.client_id)
+
+    def has_expired(self):
+        return timezone.now() >= self.expires_at
+
+
+def uses_jwt_access_tokens(client_id):
+    """
+    Check if a client has JWT access tokens enabled.
+
+    :type client_id: str
+    :param client_id: The client_id of the OIDC client
+    :rtype: bool
+    """
+    return client_id in _jwt_access_token_clients.get()
+
+
+def _load_jwt_access_token_clients():
+    return frozenset(OidcClientOptions.objects.filter(jwt_access_tokens=True).values_list(
+        'oidc_client__client_id', flat=True))
+
+
+# The login methods version is bumped on every change of the OIDC client
+# options, see users.signals
+_jwt_access_token_clients = VersionedValue(LOGIN_METHODS_VERSION, _load_jwt_access_token_clients)
+
+
+def encode_access_token(token, request=None):
+    """
+    Encode an access token as a signed JWT.
+
+    The audience of the JWT is Tunnistamo itself and the APIs which the
+    token has scopes for.
+
+    :type token: oidc_provider.models.Token
+    :type request: django.http.HttpRequest|None
+    :rtype: str
+    """
+    now = timezone.now()
+    issuer = get_issuer(request=request)
+    scopes_by_api = get_api_scope_registry().get_api_scopes_by_api(token.scope, token.client_id)
+    payload = {
+        'iss': issuer,
+        'sub': str(token.user.uuid),
+        'aud': [issuer] + list(scopes_by_api.keys()),
+        'client_id': token.client.client_id,
+        'scope': ' '.join(token.scope),
+        'iat': int(now.timestamp()),
+        'exp': int(token.expires_at.timestamp()),
+        'jti': _hash(token.access_token),
+    }
+    _cache_token(token)
+    return sign_rs256(payload, ACCESS_TOKEN_TYPE)
+
+
+def decode_access_token(value):
+    """
+    Verify a JWT access token locally.
+
+    :type value: str
+    :rtype: LocalAccessToken|None
+    :return: The access token, or None if the JWT is invalid, expired,
+      revoked or not an access token
+    """
+    payload = verify_rs256(value, ACCESS_TOKEN_TYPE)
+    if not payload or not payload.get('jti'):
+        return None
+    expires_at = datetime.datetime.fromtimestamp(payload.get('exp', 0), tz=timezone.utc)
+    if expires_at <= timezone.now() or _is_hash_revoked(payload['jti']):
+        return None
+    entry = _get_token_entry(payload)
+    if entry is None:
+        return None
+    (access_token, user_id, client_id) = entry
+    return LocalAccessToken(
+        access_token=access_token,
+        scope=payload.get('scope', '').split(),
+        user_id=user_id,
+        client_id=client_id,
+        expires_at=expires_at)
+
+
+def is_jwt(value):
+    return value.count('.') == 2
+
+
+def is_revoked(access_token):
+    """
+    Check if an access token is in the revocation list.
+
+    :type access_token: str
+    :rtype: bool
+    """
+    return _is_hash_revoked(_hash(access_token))
+
+
+def revoke_access_token(token):
+    """
+    Add a deleted access token to the revocation list until it expires.
+
+    :type token: oidc_provider.models.Token
+    """
+    timeout = int((token.expires_at - timezone.now()).total_seconds())
+    if timeout <= 0:
+        return
+    token_hash = _hash(token.access_token)
+    cache = get_cache()
+    cache.set(_get_revocation_key(token_hash), True, timeout=timeout)
+    cache.delete(_get_token_key(token_hash))
+
+
+def protected_resource_view(scopes=()):
+    """
+    Protect a view with an opaque or a JWT access token.
+
+    Works like the decorator of oidc_provider, but verifies JWT access
+    tokens locally and passes them to the view as LocalAccessToken.
+    """
+    def wrapper(view):
+        oidc_view = oidc_protected_resource_view(list(scopes))(view)
+
+        @wraps(view)
+        def view_wrapper(request, *args, **kwargs):
+            value = extract_access_token(request)
+            if not is_jwt(value):
+                return oidc_view(request, *args, **kwargs)
+            token = decode_access_token(value)
+            if token is None:
+                return _bearer_error_response(BearerTokenError('invalid_token'))
+            if not set(scopes).issubset(set(token.scope)):
+                return _bearer_error_response(BearerTokenError('insufficient_scope'))
+            kwargs['token'] = token
+            return view(request, *args, **kwargs)
+        return view_wrapper
+    return wrapper
+
+
+def accept_jwt_access_tokens(view):
+    """
+    Make an oidc_provider protected view accept JWT access tokens.
+
+    A valid JWT is replaced with the opaque access token it contains
+    before calling the view.
+    """
+    @wraps(view)
+    def view_wrapper(request, *args, **kwargs):
+        value = extract_access_token(request)
+        if is_jwt(value):
+            token = decode_access_token(value)
+            if token is None:
+                return _bearer_error_response(BearerTokenError('invalid_token'))
+            if 'HTTP_AUTHORIZATION' in request.META:
+                request.META['HTTP_AUTHORIZATION'] = 'Bearer ' + token.access_token
+            else:
+                request.GET = request.GET.copy()
+                request.GET['access_token'] = token.access_token
+        return view(request, *args, **kwargs)
+    return view_wrapper
+
+
+def issue_jwt_access_tokens(view):
+    """
+    Make a token endpoint view issue JWT access tokens when enabled.
+
+    The access token of a successful response is replaced with a JWT if
+    the client has JWT access tokens enabled.  The at_hash claim of the
+    ID Token is updated to match the JWT.
+    """
+    @wraps(view)
+    def view_wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        (client_id, _) = get_client_credentials(request)
+        if not uses_jwt_access_tokens(client_id):
+            return response
+        dic = json.loads(response.content.decode('utf-8'))
+        token = Token.objects.select_related('client', 'user').filter(
+            access_token=dic.get('access_token')).first()
+        if not token:
+            return response
+        dic['access_token'] = encode_access_token(token, request)
+        if dic.get('id_token'):
+            dic['id_token'] = _update_at_hash(dic['id_token'], dic['access_token'], token.client)
+        response.content = json.dumps(dic)
+        return response
+    return view_wrapper
+
+
+def _update_at_hash(id_token, access_token, client):
+    payload_part = id_token.split('.')[1]
+    payload = json.loads(base64.urlsafe_b64decode(
+        payload_part + '=' * (-len(payload_part) % 4)).decode('utf-8'))
+    if 'at_hash' not in payload:
+        return id_token
+    digest = hashlib.sha256(access_token.encode('ascii')).digest()
+    payload['at_hash'] = base64.urlsafe_b64encode(
+        digest[:len(digest) // 2]).rstrip(b'=').decode('ascii')
+    return encode_id_token(payload, client)
+
+
+def _bearer_error_response(error):
+    response = HttpResponse(status=error.status)
+    response['WWW-Authenticate'] = 'error="{0}", error_description="{1}"'.format(
+        error.code, error.description)
+    return response
+
+
+def _cache_token(token):
+    timeout = int((token.expires_at - timezone.now()).total_seconds())
+    if timeout > 0:
+        get_cache().set(
+            _get_token_key(_hash(token.access_token)),
+            (token.access_token, token.user_id, token.client_id), timeout=timeout)
+
+
+def _get_token_entry(payload):
+    entry = get_cache().get(_get_token_key(payload['jti']))
+    if entry is None:
+        # Fall back to the database if the entry was evicted.  The user
+        # has only a few tokens for the client, so compare their hashes.
+        candidates = Token.objects.filter(
+            client__client_id=payload.get('client_id'), user__uuid=payload.get('sub'),
+        ).values_list('access_token', 'user_id', 'client_id')
+        entry = next((
+            candidate for candidate in candidates
+            if constant_time_compare(_hash(candidate[0]), payload['jti'])), None)
+    return entry
+
+
+def _is_hash_revoked(token_hash):
+    return get_cache().get(_get_revocation_key(token_hash)) is not None
+
+
+def _get_revocation_key(token_hash):
+    return 'oidc_apis:revoked_access_token:{}'.format(token_hash)
+
+
+def _get_token_key(token_hash):
+    return 'oidc_apis:access_token:{}'.format(token_hash)
+
+
+def _hash(access_token):
+    return hashlib.sha256(access_token.encode('utf-8')).hexdigest()
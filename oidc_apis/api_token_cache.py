@@ -0,0 +1,91 @@
+import hashlib
+import json
+
+from django.utils import timezone
+from oidc_provider.lib.utils.common import get_issuer
+
+from tunnistamo.cache import get_cache
+from users.cache import get_user_version
+
+
+def get_cached_api_tokens(token, scopes_by_api, request=None):
+    """
+    Get the still valid cached API tokens of an Access Token.
+
+    A cached API token is valid if it was generated for the same claims
+    as the API token would be generated now, i.e. the user data, the API
+    scopes and the issuer are still the same.
+
+    :type token: oidc_provider.models.Token
+    :type scopes_by_api: dict[str,list]
+    :param scopes_by_api: API scopes by the API identifiers
+    :type request: django.http.HttpRequest|None
+    :rtype: dict[str,str]
+    :return: Cached API tokens with API identifier as the key
+    """
+    cached = get_cache().get(_get_cache_key(token)) or {}
+    fingerprints = _get_fingerprints(token, scopes_by_api, request)
+    return {
+        api_identifier: cached[api_identifier][1]
+        for (api_identifier, fingerprint) in fingerprints.items()
+        if cached.get(api_identifier, (None,))[0] == fingerprint
+    }
+
+
+def cache_api_tokens(token, scopes_by_api, api_tokens, request=None):
+    """
+    Cache generated API tokens of an Access Token until it expires.
+
+    :type token: oidc_provider.models.Token
+    :type scopes_by_api: dict[str,list]
+    :type api_tokens: dict[str,str]
+    :param api_tokens: The API tokens with API identifier as the key
+    :type request: django.http.HttpRequest|None
+    """
+    timeout = int((token.expires_at - timezone.now()).total_seconds())
+    if timeout <= 0 or not api_tokens:
+        return
+    cache = get_cache()
+    key = _get_cache_key(token)
+    fingerprints = _get_fingerprints(token, scopes_by_api, request)
+    cached = cache.get(key) or {}
+    cached.update(
+        (api_identifier, (fingerprints[api_identifier], api_token))
+        for (api_identifier, api_token) in api_tokens.items())
+    cache.set(key, cached, timeout=timeout)
+
+
+def invalidate_api_tokens(token):
+    """
+    Remove cached API tokens of an Access Token.
+
+    :type token: oidc_provider.models.Token
+    """
+    get_cache().delete(_get_cache_key(token))
+
+
+def _get_cache_key(token):
+    token_hash = hashlib.sha256(token.access_token.encode('utf-8'))
+    return 'oidc_apis:api_tokens:{}'.format(token_hash.hexdigest())
+
+
+def _get_fingerprints(token, scopes_by_api, request):
+    base = [
+        get_user_version(token.user_id),
+        get_issuer(request=request),
+    ]
+    return {
+        api_identifier: _get_fingerprint(base + [
+            api_identifier,
+            sorted(api_scope.relative_identifier for api_scope in api_scopes),
+            sorted(api_scopes[0].api.required_scopes),
+            api_scopes[0].api.oidc_client.client_id,
+            api_scopes[0].api.domain.identifier,
+        ])
+        for (api_identifier, api_scopes) in scopes_by_api.items()
+    }
+
+
+def _get_fingerprint(data):
+    serialized = json.dumps(data, separators=(',', ':'))
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
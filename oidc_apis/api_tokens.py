@@ -1,13 +1,23 @@
 import datetime
 from collections import defaultdict
+from collections.abc import Mapping
 
 from django.utils import timezone
-from oidc_provider.lib.utils.token import create_id_token, encode_id_token
 
-from .models import ApiScope
+from .api_token_cache import cache_api_tokens, get_cached_api_tokens
+from .id_token import create_id_token
+from .registry import get_api_scope_registry
+from .signing import encode_id_token
 
 
-def get_api_tokens_by_access_token(token, request=None):
+class UnknownAudience(Exception):
+    def __init__(self, audiences):
+        self.audiences = audiences
+        super(UnknownAudience, self).__init__(
+            'Unknown audience: {}'.format(', '.join(audiences)))
+
+
+def get_api_tokens_by_access_token(token, request=None, audiences=None, lazy=False):
     """
     Get API Tokens for given Access Token.
 
@@ -17,22 +27,79 @@ def get_api_tokens_by_access_token(token, request=None):
     :type request: django.http.HttpRequest|None
     :param request: Optional request object for resolving issuer URLs
 
-    :rtype: dict[str,str]
-    :return: Dictionary of the API tokens with API identifer as the key
-    """
-    # Limit scopes to known and allowed API scopes
-    known_api_scopes = ApiScope.objects.by_identifiers(token.scope)
-    allowed_api_scopes = known_api_scopes.allowed_for_client(token.client)
+    :type audiences: Iterable[str]|None
+    :param audiences:
+      Identifiers of the APIs to get the API tokens for, or None for
+      all APIs the Access Token has scopes for
 
-    # Group API scopes by the API identifiers
-    scopes_by_api = defaultdict(list)
-    for api_scope in allowed_api_scopes:
-        scopes_by_api[api_scope.api.identifier].append(api_scope)
+    :type lazy: bool
+    :param lazy:
+      Return a mapping which generates each API token only when it's
+      accessed
 
-    return {
+    :rtype: dict[str,str]|LazyApiTokens
+    :return: Dictionary of the API tokens with API identifer as the key
+
+    :raises UnknownAudience: if some of the audiences is not a known API
+    """
+    # Limit scopes to known and allowed API scopes and group them by
+    # the API identifiers
+    registry = get_api_scope_registry()
+    scopes_by_api = registry.get_api_scopes_by_api(
+        token.scope, token.client_id)
+
+    if audiences is not None:
+        audiences = list(audiences)
+        unknown = [aud for aud in audiences if aud not in registry.apis]
+        if unknown:
+            raise UnknownAudience(unknown)
+        for api_identifier in list(scopes_by_api.keys()):
+            if api_identifier not in audiences:
+                del scopes_by_api[api_identifier]
+
+    if lazy:
+        return LazyApiTokens(token, scopes_by_api, request)
+
+    # Sign only the API tokens which are not already cached
+    api_tokens = get_cached_api_tokens(token, scopes_by_api, request)
+    new_api_tokens = {
         api_identifier: generate_api_token(scopes, token, request)
         for (api_identifier, scopes) in scopes_by_api.items()
+        if api_identifier not in api_tokens
     }
+    cache_api_tokens(token, scopes_by_api, new_api_tokens, request)
+    api_tokens.update(new_api_tokens)
+    return api_tokens
+
+
+class LazyApiTokens(Mapping):
+    """
+    API tokens of an Access Token generated on access.
+    """
+    def __init__(self, token, scopes_by_api, request=None):
+        self.token = token
+        self.scopes_by_api = scopes_by_api
+        self.request = request
+        self._api_tokens = None
+
+    def __getitem__(self, api_identifier):
+        if self._api_tokens is None:
+            self._api_tokens = get_cached_api_tokens(
+                self.token, self.scopes_by_api, self.request)
+        if api_identifier not in self._api_tokens:
+            api_scopes = self.scopes_by_api[api_identifier]
+            api_token = generate_api_token(api_scopes, self.token, self.request)
+            cache_api_tokens(
+                self.token, {api_identifier: api_scopes},
+                {api_identifier: api_token}, self.request)
+            self._api_tokens[api_identifier] = api_token
+        return self._api_tokens[api_identifier]
+
+    def __iter__(self):
+        return iter(self.scopes_by_api)
+
+    def __len__(self):
+        return len(self.scopes_by_api)
 
 
 def generate_api_token(api_scopes, token, request=None):
@@ -46,13 +113,22 @@ def generate_api_token(api_scopes, token, request=None):
 
     payload = {}
     payload.update(id_token)
-    payload.update(_get_api_authorization_claims(api_scopes))
+    payload.update(get_api_authorization_claims(api_scopes))
     payload['exp'] = _get_api_token_expires_at(token)
 
     return encode_id_token(payload, api.oidc_client)
 
 
-def _get_api_authorization_claims(api_scopes):
+def get_api_authorization_claims(api_scopes):
+    """
+    Get the authorization claims of API scopes.
+
+    :type api_scopes: Iterable[ApiScopeEntry]
+    :rtype: dict[str,list[str]]
+    :return:
+      Relative identifiers of the API scopes with the identifier of
+      their API domain as the key
+    """
     claims = defaultdict(list)
     for api_scope in api_scopes:
         field = api_scope.api.domain.identifier
@@ -62,10 +138,18 @@ def _get_api_authorization_claims(api_scopes):
 
 def _get_api_token_expires_at(token):
     # TODO: Should API tokens have a separate expire time?
-    return int(_datetime_to_timestamp(token.expires_at))
+    return int(datetime_to_timestamp(token.expires_at))
 
 
-def _datetime_to_timestamp(dt):
+def datetime_to_timestamp(dt):
+    """
+    Convert a datetime to seconds since the epoch.
+
+    Naive datetimes are in the default time zone.
+
+    :type dt: datetime.datetime
+    :rtype: float
+    """
     if timezone.is_naive(dt):
         tz = timezone.get_default_timezone()
         dt = timezone.make_aware(dt, tz)
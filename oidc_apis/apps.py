@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.translation import ugettext_lazy as _
+
+
+class OidcApisConfig(AppConfig):
+    name = 'oidc_apis'
+    verbose_name = _('OIDC APIs')
+
+    def ready(self):
+        # Register signal handlers
+        from . import signals  # noqa
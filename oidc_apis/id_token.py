@@ -1,13 +1,40 @@
-import inspect
+import sys
+import threading
+
+from oidc_provider.lib.utils import token as oidc_token_utils
 
 from .scopes import get_userinfo_by_scopes
 
+_state = threading.local()
+
+
+def create_id_token(user, aud, nonce='', at_hash='', request=None, scope=[]):
+    """
+    Create the ID Token dictionary.
+
+    Wrapper of oidc_provider's create_id_token, which passes the scope
+    to process_id_token, since the processing hook isn't given it.
+
+    :rtype: dict
+    """
+    previous_scope = getattr(_state, 'scope', None)
+    _state.scope = scope
+    try:
+        return oidc_token_utils.create_id_token(
+            user, aud, nonce=nonce, at_hash=at_hash, request=request,
+            scope=scope)
+    finally:
+        _state.scope = previous_scope
+
 
 def process_id_token(payload, user, scope=None):
     if scope is None:
-        # HACK: Steal the scope argument from the locals dictionary of
-        # the caller, since it was not passed to us
-        scope = inspect.stack()[1][0].f_locals.get('scope', [])
+        scope = getattr(_state, 'scope', None)
+    if scope is None:
+        # HACK: Not called via our create_id_token wrapper, so steal the
+        # scope argument from the locals of the immediate caller (i.e.
+        # oidc_provider's create_id_token), since it was not passed to us
+        scope = sys._getframe(1).f_locals.get('scope', [])
 
     payload.update(get_userinfo_by_scopes(user, scope))
     return payload
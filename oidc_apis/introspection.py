@@ -0,0 +1,121 @@
+import hashlib
+
+from django.conf import settings
+from django.utils import timezone
+from oidc_provider.models import Token
+
+from tunnistamo.cache import get_cache, get_version
+
+from .access_tokens import decode_access_token, is_jwt, is_revoked
+from .api_tokens import datetime_to_timestamp, get_api_authorization_claims
+from .registry import REGISTRY_VERSION, get_api_scope_registry
+
+INACTIVE = {'active': False}
+
+
+def introspect_tokens(values, resource_server):
+    """
+    Introspect access tokens for a resource server.
+
+    The result of each token is the RFC 7662 introspection response
+    extended with the API authorization claims of those APIs which the
+    resource server serves.  Tokens are reported active only to the
+    resource servers of their API scopes and to their own client.  The
+    results of active tokens are cached until the token expires, is
+    revoked or the API scopes change.
+
+    :type values: list[str]
+    :param values: The opaque or JWT access tokens
+    :type resource_server: oidc_provider.models.Client
+    :param resource_server: The authenticated client of the caller
+    :rtype: list[dict]
+    :return: Introspection results in the order of the tokens
+    """
+    cache = get_cache()
+    registry_version = get_version(REGISTRY_VERSION)
+    keys = [_get_cache_key(value, resource_server, registry_version) for value in values]
+    cached = cache.get_many(keys)
+    results = {}
+    for (value, key) in zip(values, keys):
+        (access_token, result) = cached.get(key, (None, None))
+        if result and get_remaining_lifetime(result) > 0 and not is_revoked(access_token):
+            results[value] = result
+
+    missing = [value for value in values if value not in results]
+    tokens = _get_tokens(missing)
+    registry = get_api_scope_registry()
+    new_entries = {}
+    for (value, key) in zip(values, keys):
+        if value in results:
+            continue
+        token = tokens.get(value)
+        if token is None or token.has_expired():
+            results[value] = INACTIVE
+            continue
+        results[value] = _build_result(token, registry, resource_server)
+        if results[value]['active']:
+            new_entries[key] = (token.access_token, results[value])
+
+    for (key, entry) in new_entries.items():
+        timeout = min(get_remaining_lifetime(entry[1]), settings.TOKEN_INTROSPECTION_CACHE_TIMEOUT)
+        cache.set(key, entry, timeout=timeout)
+    return [results[value] for value in values]
+
+
+def get_remaining_lifetime(result):
+    """
+    Get the number of seconds an introspection result stays valid.
+
+    :type result: dict
+    :rtype: int
+    """
+    if not result.get('active'):
+        return 0
+    return max(int(result['exp'] - datetime_to_timestamp(timezone.now())), 0)
+
+
+def _get_tokens(values):
+    tokens = {}
+    opaque = []
+    for value in values:
+        if is_jwt(value):
+            tokens[value] = decode_access_token(value)
+        else:
+            opaque.append(value)
+    if opaque:
+        queryset = Token.objects.filter(access_token__in=opaque).select_related('client', 'user')
+        tokens.update((token.access_token, token) for token in queryset)
+    return tokens
+
+
+def _build_result(token, registry, resource_server):
+    scopes_by_api = registry.get_api_scopes_by_api(token.scope, token.client_id)
+    api_scopes = [
+        api_scope
+        for (api_identifier, scopes) in scopes_by_api.items()
+        for api_scope in scopes
+        if api_scope.api.oidc_client and api_scope.api.oidc_client.pk == resource_server.pk
+    ]
+    if not api_scopes and token.client_id != resource_server.pk:
+        # Don't tell others who holds the token
+        return INACTIVE
+    result = {
+        'active': True,
+        'scope': ' '.join(token.scope),
+        'client_id': token.client.client_id,
+        'sub': str(token.user.uuid),
+        'exp': int(datetime_to_timestamp(token.expires_at)),
+        'token_type': 'Bearer',
+    }
+    if api_scopes:
+        result['aud'] = resource_server.client_id
+        result.update(get_api_authorization_claims(api_scopes))
+    return result
+
+
+def _get_cache_key(value, resource_server, registry_version):
+    token_hash = hashlib.sha256(value.encode('utf-8')).hexdigest()
+    return 'oidc_apis:introspection:{registry}:{client}:{token}'.format(
+        registry=registry_version,
+        client=resource_server.pk,
+        token=token_hash)
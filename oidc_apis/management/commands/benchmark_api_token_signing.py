@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from oidc_provider.lib.utils import token as oidc_token_utils
+from oidc_provider.models import Client, RSAKey
+
+from oidc_apis import signing
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the per-token cost of signing API tokens with and "
+        "without the parsed signing key cache.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count', type=int, default=100,
+            help="Number of tokens to sign per method (default: 100)")
+
+    def handle(self, *args, **options):
+        count = options['count']
+        if count <= 0:
+            raise CommandError("Count must be positive")
+        if not RSAKey.objects.exists():
+            raise CommandError("There are no RSA keys to sign with")
+
+        client = Client(client_id='benchmark', jwt_alg='RS256')
+        payload = {
+            'iss': 'https://example.com/openid',
+            'sub': 'benchmark',
+            'aud': client.client_id,
+            'exp': int(time.time()) + 3600,
+            'iat': int(time.time()),
+        }
+
+        methods = [
+            ('uncached', oidc_token_utils.encode_id_token),
+            ('cached', signing.encode_id_token),
+        ]
+        for (name, encode) in methods:
+            encode(payload, client)  # Warm up
+            start = time.perf_counter()
+            for _ in range(count):
+                encode(payload, client)
+            elapsed = time.perf_counter() - start
+            self.stdout.write("{name}: {ms:.3f} ms/token ({count} tokens)".format(
+                name=name, ms=(elapsed * 1000.0 / count), count=count))
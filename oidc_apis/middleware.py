@@ -0,0 +1,18 @@
+from django.utils.deprecation import MiddlewareMixin
+
+from .scopes import start_claims_memo, stop_claims_memo
+
+
+class ClaimsMemoMiddleware(MiddlewareMixin):
+    """
+    Memoize the userinfo claims for the duration of a request.
+
+    A single token response may need the claims of the same user and
+    scopes several times, e.g. for the ID Token and for the API Tokens.
+    """
+    def process_request(self, request):
+        start_claims_memo()
+
+    def process_response(self, request, response):
+        stop_claims_memo()
+        return response
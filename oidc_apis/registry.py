@@ -0,0 +1,129 @@
+from collections import OrderedDict, defaultdict, namedtuple
+
+from tunnistamo.cache import VersionedValue
+
+from .models import ApiScope
+
+REGISTRY_VERSION = 'oidc_apis.registry'
+
+ApiDomainEntry = namedtuple('ApiDomainEntry', [
+    'identifier',
+])
+
+ApiEntry = namedtuple('ApiEntry', [
+    'identifier', 'name', 'domain', 'required_scopes', 'oidc_client',
+])
+
+ApiScopeEntry = namedtuple('ApiScopeEntry', [
+    'id', 'identifier', 'relative_identifier', 'api', 'allowed_client_ids',
+])
+
+
+class ApiScopeRegistry(object):
+    """
+    In-memory snapshot of the API domains, APIs and API scopes.
+
+    The entries mimic the attributes of the corresponding models, so
+    that they can be used in place of ApiScope and Api objects when
+    generating the API tokens.
+    """
+    def __init__(self, api_scopes):
+        """
+        :type api_scopes: Iterable[ApiScopeEntry]
+        """
+        self.api_scopes = OrderedDict(
+            (api_scope.identifier, api_scope) for api_scope in api_scopes)
+        self.apis = OrderedDict(
+            (api_scope.api.identifier, api_scope.api)
+            for api_scope in self.api_scopes.values())
+
+    @classmethod
+    def load(cls):
+        """
+        Load the registry from the database.
+
+        :rtype: ApiScopeRegistry
+        """
+        through_model = ApiScope.allowed_apps.through
+        allowed_client_ids = defaultdict(set)
+        for (api_scope_id, client_id) in through_model.objects.values_list(
+                'apiscope_id', 'client_id'):
+            allowed_client_ids[api_scope_id].add(client_id)
+
+        domains = {}
+        apis = {}
+        api_scopes = []
+        queryset = ApiScope.objects.select_related(
+            'api', 'api__domain', 'api__oidc_client').order_by('identifier')
+        for api_scope in queryset:
+            api = api_scope.api
+            if api.pk not in apis:
+                if api.domain_id not in domains:
+                    domains[api.domain_id] = ApiDomainEntry(
+                        identifier=api.domain.identifier)
+                apis[api.pk] = ApiEntry(
+                    identifier=api.identifier,
+                    name=api.name,
+                    domain=domains[api.domain_id],
+                    required_scopes=tuple(api.required_scopes),
+                    oidc_client=api.oidc_client)
+            api_scopes.append(ApiScopeEntry(
+                id=api_scope.pk,
+                identifier=api_scope.identifier,
+                relative_identifier=api_scope.relative_identifier,
+                api=apis[api.pk],
+                allowed_client_ids=frozenset(
+                    allowed_client_ids.get(api_scope.pk, ()))))
+        return cls(api_scopes)
+
+    def get_api_scopes(self, scopes):
+        """
+        Get the known API scopes of given scope list.
+
+        :type scopes: Iterable[str]
+        :rtype: list[ApiScopeEntry]
+        """
+        return [
+            self.api_scopes[scope]
+            for scope in scopes if scope in self.api_scopes
+        ]
+
+    def get_api_scopes_by_api(self, scopes, client_id):
+        """
+        Get the API scopes allowed for a client grouped by the API.
+
+        :type scopes: Iterable[str]
+        :param scopes: Scope identifiers to look for
+        :type client_id: int
+        :param client_id: Primary key of the OIDC client
+        :rtype: OrderedDict[str,list[ApiScopeEntry]]
+        :return: API scopes by the API identifiers
+        """
+        scopes_by_api = OrderedDict()
+        for api_scope in self.get_api_scopes(scopes):
+            if client_id in api_scope.allowed_client_ids:
+                api_identifier = api_scope.api.identifier
+                scopes_by_api.setdefault(api_identifier, []).append(api_scope)
+        return scopes_by_api
+
+
+_registry = VersionedValue(REGISTRY_VERSION, ApiScopeRegistry.load)
+
+
+def get_api_scope_registry():
+    """
+    Get an up-to-date API scope registry.
+
+    The registry is reloaded from the database only if its version
+    differs from the version in the shared cache.
+
+    :rtype: ApiScopeRegistry
+    """
+    return _registry.get()
+
+
+def invalidate_api_scope_registry():
+    """
+    Make all processes reload their API scope registry.
+    """
+    _registry.invalidate()
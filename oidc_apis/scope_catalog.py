@@ -0,0 +1,125 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils.translation import get_language
+from parler import appsettings as parler_settings
+
+from tunnistamo.cache import VersionedValue
+
+from .models import ApiScopeTranslation
+from .registry import get_api_scope_registry
+
+ScopeInfo = namedtuple('ScopeInfo', [
+    'identifier', 'name', 'description', 'required_scopes',
+])
+
+
+class ScopeCatalog(object):
+    """
+    Translated information of the API scopes in a single language.
+    """
+    def __init__(self, language_code, scope_infos):
+        """
+        :type language_code: str
+        :type scope_infos: Iterable[ScopeInfo]
+        """
+        self.language_code = language_code
+        self.scope_infos = {info.identifier: info for info in scope_infos}
+
+    @classmethod
+    def load(cls, language_code):
+        """
+        Load the catalog of given language.
+
+        Uses the same fallback languages as the translated fields of the
+        API scopes do.
+
+        :type language_code: str
+        :rtype: ScopeCatalog
+        """
+        languages = parler_settings.PARLER_LANGUAGES.get_active_choices(
+            language_code)
+        translations = {}
+        queryset = ApiScopeTranslation.objects.filter(
+            language_code__in=languages).values_list(
+                'master_id', 'language_code', 'name', 'description')
+        for (master_id, language, name, description) in queryset:
+            translations[(master_id, language)] = (name, description)
+
+        scope_infos = []
+        for (api_scope_id, api_scope) in _get_api_scopes_by_id().items():
+            (name, description) = next((
+                translations[(api_scope_id, language)]
+                for language in languages
+                if (api_scope_id, language) in translations), ('', ''))
+            scope_infos.append(ScopeInfo(
+                identifier=api_scope.identifier,
+                name=name,
+                description=description,
+                required_scopes=api_scope.api.required_scopes))
+        return cls(language_code, scope_infos)
+
+    def get_scopes_info(self, scopes):
+        """
+        Get the scope information of the known API scopes.
+
+        :type scopes: Iterable[str]
+        :rtype: list[dict]
+        """
+        return [
+            {
+                'scope': info.identifier,
+                'name': info.name,
+                'description': info.description,
+            }
+            for info in (self.scope_infos.get(scope) for scope in scopes)
+            if info
+        ]
+
+    def get_required_scopes(self, scopes):
+        """
+        Get the standard scopes required by the APIs of the API scopes.
+
+        :type scopes: Iterable[str]
+        :rtype: set[str]
+        """
+        required_scopes = set()
+        for scope in scopes:
+            info = self.scope_infos.get(scope)
+            if info:
+                required_scopes.update(info.required_scopes)
+        return required_scopes
+
+
+def _get_api_scopes_by_id():
+    registry = get_api_scope_registry()
+    return {
+        api_scope.id: api_scope
+        for api_scope in registry.api_scopes.values()
+    }
+
+
+_catalogs = VersionedValue('oidc_apis.scope_catalog', dict)
+
+
+def get_scope_catalog(language_code=None):
+    """
+    Get the scope catalog of given or the active language.
+
+    :type language_code: str|None
+    :rtype: ScopeCatalog
+    """
+    language_code = language_code or get_language() or settings.LANGUAGE_CODE
+    catalogs = _catalogs.get()
+    catalog = catalogs.get(language_code)
+    if catalog is None:
+        catalog = ScopeCatalog.load(language_code)
+        catalogs[language_code] = catalog
+    return catalog
+
+
+def invalidate_scope_catalogs():
+    """
+    Make all processes rebuild their scope catalogs.
+    """
+    _catalogs.invalidate()
@@ -1,26 +1,20 @@
+import copy
+import threading
+from contextlib import contextmanager
+
 from django.utils.translation import ugettext_lazy as _
 from oidc_provider.lib.claims import ScopeClaims, StandardScopeClaims
 
-from .models import ApiScope
+from users.userinfo import get_userinfo_snapshot
+
+from .scope_catalog import get_scope_catalog
 from .utils import combine_uniquely
 
 
 class ApiScopeClaims(ScopeClaims):
     @classmethod
     def get_scopes_info(cls, scopes=[]):
-        scopes_by_identifier = {
-            api_scope.identifier: api_scope
-            for api_scope in ApiScope.objects.by_identifiers(scopes)
-        }
-        api_scopes = (scopes_by_identifier.get(scope) for scope in scopes)
-        return [
-            {
-                'scope': api_scope.identifier,
-                'name': api_scope.name,
-                'description': api_scope.description,
-            }
-            for api_scope in api_scopes if api_scope
-        ]
+        return get_scope_catalog().get_scopes_info(scopes)
 
 
 class GithubUsernameScopeClaims(ScopeClaims):
@@ -28,13 +22,11 @@ class GithubUsernameScopeClaims(ScopeClaims):
         _("GitHub username"), _("Access to your GitHub username."))
 
     def scope_github_username(self):
-        social_accounts = self.user.socialaccount_set
-        github_account = social_accounts.filter(provider='github').first()
-        if not github_account:
+        github_username = get_userinfo_snapshot(self.user)['github_username']
+        if not github_username:
             return {}
-        github_data = github_account.extra_data
         return {
-            'github_username': github_data.get('login'),
+            'github_username': github_username,
         }
 
 
@@ -66,11 +58,13 @@ class CombinedScopeClaims(ScopeClaims):
 
     @classmethod
     def _get_all_required_scopes_by_api_scopes(cls, scopes):
-        api_scopes = ApiScope.objects.by_identifiers(scopes)
-        apis = {x.api for x in api_scopes}
-        return set(sum((list(api.required_scopes) for api in apis), []))
+        return get_scope_catalog().get_required_scopes(scopes)
 
     def create_response_dic(self):
+        return _memoize_claims(
+            self.user, self.scopes, self.client, self._create_response_dic)
+
+    def _create_response_dic(self):
         result = super(CombinedScopeClaims, self).create_response_dic()
         token = FakeToken.from_claims(self)
         for claim_cls in self.combined_scope_claims:
@@ -105,4 +99,51 @@ def get_userinfo_by_scopes(user, scopes, client=None):
 
 
 def _get_userinfo_by_token(token):
-    return CombinedScopeClaims(token).create_response_dic()
+    # Look up the memo before creating the claims object, since its
+    # constructor already builds the userinfo
+    return _memoize_claims(
+        token.user, token.scope, token.client,
+        lambda: CombinedScopeClaims(token)._create_response_dic())
+
+
+_claims_memo = threading.local()
+
+
+@contextmanager
+def claims_memo():
+    """
+    Context manager for memoizing the claims built within it.
+
+    While active, the claims of each (user, scopes, client) combination
+    are built only once.  Joins the memo of an enclosing block, if any.
+    """
+    if getattr(_claims_memo, 'claims', None) is not None:
+        yield
+        return
+    start_claims_memo()
+    try:
+        yield
+    finally:
+        stop_claims_memo()
+
+
+def start_claims_memo():
+    _claims_memo.claims = {}
+
+
+def stop_claims_memo():
+    _claims_memo.claims = None
+
+
+def _memoize_claims(user, scopes, client, create_claims):
+    memo = getattr(_claims_memo, 'claims', None)
+    if memo is None:
+        return create_claims()
+    key = (
+        getattr(user, 'pk', None),
+        frozenset(scopes),
+        getattr(client, 'pk', None),
+    )
+    if key not in memo:
+        memo[key] = create_claims()
+    return copy.deepcopy(memo[key])
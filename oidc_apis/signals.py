@@ -0,0 +1,36 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from oidc_provider.models import Client, RSAKey, Token
+
+from .access_tokens import revoke_access_token
+from .api_token_cache import invalidate_api_tokens
+from .models import Api, ApiDomain, ApiScope, ApiScopeTranslation
+from .registry import invalidate_api_scope_registry
+from .scope_catalog import invalidate_scope_catalogs
+from .signing import invalidate_signing_keys
+
+
+@receiver([post_save, post_delete], sender=ApiDomain)
+@receiver([post_save, post_delete], sender=Api)
+@receiver([post_save, post_delete], sender=ApiScope)
+@receiver([post_save, post_delete], sender=Client)
+@receiver(m2m_changed, sender=ApiScope.allowed_apps.through)
+def invalidate_registry_on_change(sender, **kwargs):
+    invalidate_api_scope_registry()
+    invalidate_scope_catalogs()
+
+
+@receiver([post_save, post_delete], sender=ApiScopeTranslation)
+def invalidate_scope_catalogs_on_change(sender, **kwargs):
+    invalidate_scope_catalogs()
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_api_tokens_on_revoke(sender, instance, **kwargs):
+    invalidate_api_tokens(instance)
+    revoke_access_token(instance)
+
+
+@receiver([post_save, post_delete], sender=RSAKey)
+def invalidate_signing_keys_on_change(sender, **kwargs):
+    invalidate_signing_keys()
@@ -0,0 +1,141 @@
+import json
+from collections import OrderedDict
+
+from Cryptodome.PublicKey.RSA import importKey
+from jwkest import JWKESTException, b64d
+from jwkest.jwk import RSAKey as jwk_RSAKey
+from jwkest.jwk import SYMKey
+from jwkest.jws import JWS
+from oidc_provider.models import RSAKey
+
+from tunnistamo.cache import VersionedValue
+
+
+class SigningKeyRing(object):
+    """
+    Parsed RSA signing keys indexed by their key ids.
+    """
+    def __init__(self, keys):
+        """
+        :type keys: Iterable[jwkest.jwk.RSAKey]
+        """
+        self.keys_by_kid = OrderedDict((key.kid, key) for key in keys)
+        self.keys = list(self.keys_by_kid.values())
+
+    @classmethod
+    def load(cls):
+        """
+        Load and parse the RSA keys from the database.
+
+        :rtype: SigningKeyRing
+        """
+        return cls(
+            jwk_RSAKey(key=importKey(rsakey.key), kid=rsakey.kid)
+            for rsakey in RSAKey.objects.order_by('pk'))
+
+    def get_key(self, kid):
+        """
+        Get a parsed key by its key id.
+
+        :type kid: str
+        :rtype: jwkest.jwk.RSAKey|None
+        """
+        return self.keys_by_kid.get(kid)
+
+
+_key_ring = VersionedValue('oidc_apis.signing_keys', SigningKeyRing.load)
+
+
+def get_signing_key_ring():
+    """
+    Get the parsed RSA signing keys.
+
+    The keys are parsed once per process and reparsed only when the RSA
+    keys in the database change.
+
+    :rtype: SigningKeyRing
+    """
+    return _key_ring.get()
+
+
+def invalidate_signing_keys():
+    """
+    Make all processes reload their RSA signing keys.
+    """
+    _key_ring.invalidate()
+
+
+def get_client_alg_keys(client):
+    """
+    Get the keys for signing tokens of given client.
+
+    Works like the function with the same name in oidc_provider, but
+    uses the cached parsed RSA keys.
+
+    :type client: oidc_provider.models.Client
+    :rtype: list[jwkest.jwk.Key]
+    """
+    if client.jwt_alg == 'RS256':
+        keys = get_signing_key_ring().keys
+        if not keys:
+            raise Exception('You must add at least one RSA Key.')
+    elif client.jwt_alg == 'HS256':
+        keys = [SYMKey(key=client.client_secret, alg=client.jwt_alg)]
+    else:
+        raise Exception('Unsupported key algorithm.')
+    return keys
+
+
+def encode_id_token(payload, client):
+    """
+    Encode an ID Token (or an API Token) as a signed JWT.
+
+    Drop-in replacement of oidc_provider's encode_id_token, which avoids
+    loading and parsing the RSA keys for every token.
+
+    :type payload: dict
+    :type client: oidc_provider.models.Client
+    :rtype: str
+    """
+    keys = get_client_alg_keys(client)
+    _jws = JWS(payload, alg=client.jwt_alg)
+    return _jws.sign_compact(keys)
+
+
+def sign_rs256(payload, typ):
+    """
+    Sign a payload as a JWT with the RSA signing keys.
+
+    :type payload: dict
+    :type typ: str
+    :param typ: Value of the "typ" header
+    :rtype: str
+    """
+    keys = get_signing_key_ring().keys
+    if not keys:
+        raise Exception('You must add at least one RSA Key.')
+    return JWS(payload, alg='RS256', typ=typ).sign_compact(keys)
+
+
+def verify_rs256(value, typ):
+    """
+    Verify a JWT signed with the RSA signing keys.
+
+    :type value: str
+    :type typ: str
+    :param typ: The required value of the "typ" header
+    :rtype: dict|None
+    :return: The payload, or None if the JWT is invalid or of other type
+    """
+    try:
+        header = json.loads(b64d(value.split('.')[0].encode('ascii')).decode('utf-8'))
+        if header.get('alg') != 'RS256' or header.get('typ') != typ:
+            return None
+        key_ring = get_signing_key_ring()
+        kid = header.get('kid')
+        keys = [key_ring.get_key(kid)] if kid else key_ring.keys
+        if not keys or keys[0] is None:
+            return None
+        return JWS().verify_compact(value, keys, sigalg='RS256')
+    except (JWKESTException, ValueError, UnicodeError):
+        return None
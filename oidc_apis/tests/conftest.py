@@ -0,0 +1,85 @@
+import datetime
+import uuid
+
+import pytest
+from Cryptodome.PublicKey import RSA
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from oidc_provider.models import RSAKey, Token
+
+from oidc_apis.models import Api, ApiDomain, ApiScope
+from tunnistamo.cache import get_cache
+from users.tests.conftest import oidcclient_factory, user_factory  # noqa
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    get_cache().clear()
+
+
+@pytest.fixture()
+def api_domain_factory():
+    def make_instance(**args):
+        args.setdefault('identifier', 'https://{}.example.com/'.format(
+            get_random_string(allowed_chars='abcdefghijklmnopqrstuvwxyz')))
+
+        return ApiDomain.objects.create(**args)
+
+    return make_instance
+
+
+@pytest.fixture()
+def api_factory(api_domain_factory):
+    def make_instance(**args):
+        if 'domain' not in args:
+            args['domain'] = api_domain_factory()
+        args.setdefault('name', get_random_string(
+            allowed_chars='abcdefghijklmnopqrstuvwxyz0123456789'))
+        args.setdefault('required_scopes', [])
+
+        return Api.objects.create(**args)
+
+    return make_instance
+
+
+@pytest.fixture()
+def api_scope_factory(api_factory):
+    def make_instance(**args):
+        allowed_apps = args.pop('allowed_apps', [])
+        if 'api' not in args:
+            args['api'] = api_factory()
+        args.setdefault('specifier', '')
+        args.setdefault('name', get_random_string())
+        args.setdefault('description', get_random_string())
+
+        instance = ApiScope(**args)
+        instance.identifier = instance._generate_identifier()
+        instance.save()
+        instance.allowed_apps.set(allowed_apps)
+
+        return instance
+
+    return make_instance
+
+
+@pytest.fixture()
+def rsa_key():
+    key = RSA.generate(1024).exportKey('PEM').decode('ascii')
+    return RSAKey.objects.create(key=key)
+
+
+@pytest.fixture()
+def token_factory():
+    def make_instance(**args):
+        args.setdefault('access_token', uuid.uuid4().hex)
+        args.setdefault('refresh_token', uuid.uuid4().hex)
+        args.setdefault('expires_at', timezone.now() + datetime.timedelta(hours=1))
+        scope = args.pop('scope', ['openid'])
+
+        instance = Token(**args)
+        instance.scope = scope
+        instance.save()
+
+        return instance
+
+    return make_instance
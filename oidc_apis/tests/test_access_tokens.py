@@ -0,0 +1,118 @@
+import json
+
+import pytest
+from django.http import JsonResponse
+from django.test import RequestFactory
+from jwkest import b64d
+
+from oidc_apis.access_tokens import decode_access_token, encode_access_token, issue_jwt_access_tokens
+from oidc_apis.signing import encode_id_token
+from tunnistamo.cache import get_cache
+from users.models import OidcClientOptions
+
+
+@pytest.fixture()
+def jwt_token(rsa_key, user_factory, oidcclient_factory, token_factory):
+    client = oidcclient_factory(jwt_alg='RS256')
+    OidcClientOptions.objects.create(oidc_client=client, jwt_access_tokens=True)
+    return token_factory(user=user_factory(), client=client, scope=['openid', 'email'])
+
+
+def encode(token):
+    return encode_access_token(token, RequestFactory().get('/'))
+
+
+def decode_part(part):
+    return json.loads(b64d(part.encode('ascii')).decode('utf-8'))
+
+
+@pytest.mark.django_db
+def test_jwt_access_token_is_verified_locally(jwt_token, django_assert_num_queries):
+    value = encode(jwt_token)
+
+    with django_assert_num_queries(0):
+        token = decode_access_token(value)
+
+    assert token.access_token == jwt_token.access_token
+    assert token.scope == ['openid', 'email']
+    assert token.user_id == jwt_token.user_id
+    assert token.client_id == jwt_token.client_id
+    assert not token.has_expired()
+
+
+@pytest.mark.django_db
+def test_jwt_access_token_is_not_an_id_token(jwt_token):
+    (header, payload, signature) = encode(jwt_token).split('.')
+
+    assert decode_part(header)['typ'] == 'at+jwt'
+    assert jwt_token.access_token not in json.dumps(decode_part(payload))
+    assert jwt_token.client.client_id not in decode_part(payload)['aud']
+
+    id_token = encode_id_token({'sub': 'x', 'jti': jwt_token.access_token, 'exp': 2 ** 31}, jwt_token.client)
+    assert decode_access_token(id_token) is None
+
+
+@pytest.mark.django_db
+def test_jwt_access_token_is_resolved_without_cache(jwt_token):
+    value = encode(jwt_token)
+
+    get_cache().clear()
+
+    assert decode_access_token(value).access_token == jwt_token.access_token
+
+
+@pytest.mark.django_db
+def test_tampered_jwt_access_token_is_rejected(jwt_token):
+    (header, payload, signature) = encode(jwt_token).split('.')
+    other = encode(jwt_token).split('.')
+
+    assert decode_access_token('.'.join([header, payload, signature[:-4] + 'AAAA'])) is None
+    assert decode_access_token('.'.join([other[0], payload[:-2], other[2]])) is None
+
+
+@pytest.mark.django_db
+def test_deleted_jwt_access_token_is_revoked(jwt_token):
+    value = encode(jwt_token)
+
+    jwt_token.delete()
+
+    assert decode_access_token(value) is None
+
+
+@pytest.mark.django_db
+def test_api_tokens_view_accepts_jwt_and_opaque_tokens(client, jwt_token):
+    value = encode(jwt_token)
+
+    for access_token in [value, jwt_token.access_token]:
+        response = client.get('/api-tokens/', HTTP_AUTHORIZATION='Bearer ' + access_token)
+        assert response.status_code == 200
+
+    jwt_token.delete()
+    response = client.get('/api-tokens/', HTTP_AUTHORIZATION='Bearer ' + value)
+    assert response.status_code == 401
+
+
+@pytest.mark.django_db
+def test_token_endpoint_issues_jwt_access_tokens(jwt_token, django_assert_num_queries):
+    id_token = encode_id_token({'sub': 'x', 'at_hash': 'old'}, jwt_token.client)
+
+    def token_view(request):
+        return JsonResponse({'access_token': jwt_token.access_token, 'id_token': id_token})
+
+    def post_token():
+        request = RequestFactory().post('/openid/token/', {'client_id': jwt_token.client.client_id})
+        response = issue_jwt_access_tokens(token_view)(request)
+        return json.loads(response.content.decode('utf-8'))
+
+    dic = post_token()
+    assert decode_access_token(dic['access_token']).access_token == jwt_token.access_token
+    assert dic['id_token'] != id_token
+
+    options = OidcClientOptions.objects.get(oidc_client=jwt_token.client)
+    options.jwt_access_tokens = False
+    options.save()
+    post_token()
+
+    # The option of the client is cached
+    with django_assert_num_queries(0):
+        assert post_token()['access_token'] == jwt_token.access_token
@@ -0,0 +1,118 @@
+from unittest import mock
+
+import pytest
+from django.test import RequestFactory
+
+from oidc_apis.api_tokens import UnknownAudience, generate_api_token, get_api_tokens_by_access_token
+
+
+@pytest.fixture()
+def api_token_setup(rsa_key, user_factory, oidcclient_factory, api_factory, api_scope_factory, token_factory):
+    client = oidcclient_factory()
+    api = api_factory(required_scopes=['email'])
+    api_scope = api_scope_factory(api=api, allowed_apps=[client])
+    user = user_factory()
+    token = token_factory(user=user, client=client, scope=['openid', api_scope.identifier])
+    return (api, token)
+
+
+def get_api_tokens(token):
+    request = RequestFactory().get('/api-tokens/')
+    with mock.patch('oidc_apis.api_tokens.generate_api_token', wraps=generate_api_token) as generate:
+        api_tokens = get_api_tokens_by_access_token(token, request=request)
+    return (api_tokens, generate.call_count)
+
+
+@pytest.mark.django_db
+def test_api_tokens_are_cached(api_token_setup):
+    (api, token) = api_token_setup
+
+    (api_tokens1, generated1) = get_api_tokens(token)
+    (api_tokens2, generated2) = get_api_tokens(token)
+
+    assert list(api_tokens1.keys()) == [api.identifier]
+    assert api_tokens2 == api_tokens1
+    assert (generated1, generated2) == (1, 0)
+
+
+@pytest.mark.django_db
+def test_api_tokens_cache_is_invalidated_on_user_change(api_token_setup):
+    (api, token) = api_token_setup
+    get_api_tokens(token)
+
+    token.user.first_name = 'Changed'
+    token.user.save()
+
+    (api_tokens, generated) = get_api_tokens(token)
+    assert generated == 1
+
+
+@pytest.mark.django_db
+def test_api_tokens_cache_is_invalidated_on_revoke(api_token_setup, token_factory):
+    (api, token) = api_token_setup
+    get_api_tokens(token)
+
+    token.delete()
+    token = token_factory(
+        user=token.user, client=token.client, scope=token.scope,
+        access_token=token.access_token)
+
+    (api_tokens, generated) = get_api_tokens(token)
+    assert generated == 1
+
+
+@pytest.fixture()
+def two_api_token(rsa_key, user_factory, oidcclient_factory, api_factory, api_scope_factory, token_factory):
+    client = oidcclient_factory()
+    apis = [api_factory(), api_factory()]
+    scopes = [api_scope_factory(api=api, allowed_apps=[client]).identifier for api in apis]
+    token = token_factory(user=user_factory(), client=client, scope=['openid'] + scopes)
+    return (apis, token)
+
+
+@pytest.mark.django_db
+def test_api_tokens_by_audience(two_api_token):
+    (apis, token) = two_api_token
+    request = RequestFactory().get('/api-tokens/')
+
+    with mock.patch('oidc_apis.api_tokens.generate_api_token', wraps=generate_api_token) as generate:
+        api_tokens = get_api_tokens_by_access_token(token, request=request, audiences=[apis[1].identifier])
+
+    assert list(api_tokens.keys()) == [apis[1].identifier]
+    assert generate.call_count == 1
+
+
+@pytest.mark.django_db
+def test_api_tokens_unknown_audience(two_api_token):
+    (apis, token) = two_api_token
+
+    with pytest.raises(UnknownAudience):
+        get_api_tokens_by_access_token(token, audiences=['https://unknown.example.com/'])
+
+
+@pytest.mark.django_db
+def test_lazy_api_tokens(two_api_token):
+    (apis, token) = two_api_token
+    request = RequestFactory().get('/api-tokens/')
+
+    with mock.patch('oidc_apis.api_tokens.generate_api_token', wraps=generate_api_token) as generate:
+        api_tokens = get_api_tokens_by_access_token(token, request=request, lazy=True)
+        assert set(api_tokens.keys()) == {api.identifier for api in apis}
+        assert generate.call_count == 0
+        api_token = api_tokens[apis[0].identifier]
+        assert generate.call_count == 1
+
+    assert get_api_tokens_by_access_token(token, request=request)[apis[0].identifier] == api_token
+
+
+@pytest.mark.django_db
+def test_api_tokens_view_audience(client, two_api_token):
+    (apis, token) = two_api_token
+    auth = 'Bearer ' + token.access_token
+
+    response = client.get('/api-tokens/', {'audience': apis[0].identifier}, HTTP_AUTHORIZATION=auth)
+    assert list(response.json().keys()) == [apis[0].identifier]
+
+    response = client.get('/api-tokens/', {'api': 'https://unknown.example.com/'}, HTTP_AUTHORIZATION=auth)
+    assert response.status_code == 400
+    assert response.json()['error'] == 'invalid_audience'
@@ -0,0 +1,53 @@
+from unittest import mock
+
+import pytest
+
+from oidc_apis.id_token import create_id_token, process_id_token
+
+
+def fake_userinfo(user, scopes):
+    return {'scopes': list(scopes)}
+
+
+@pytest.fixture(autouse=True)
+def mock_userinfo():
+    with mock.patch('oidc_apis.id_token.get_userinfo_by_scopes', side_effect=fake_userinfo) as userinfo_mock:
+        yield userinfo_mock
+
+
+def call_like_oidc_provider(scope):
+    # Mimics oidc_provider's create_id_token, which has the scope in its
+    # locals, but doesn't pass it to the processing hook
+    return process_id_token({}, user=None)
+
+
+def test_process_id_token_explicit_scope():
+    assert process_id_token({}, user=None, scope=['email']) == {'scopes': ['email']}
+
+
+def test_process_id_token_caller_scope():
+    assert call_like_oidc_provider(['profile']) == {'scopes': ['profile']}
+
+
+@pytest.mark.django_db
+def test_create_id_token_passes_scope(user_factory, settings):
+    settings.SITE_URL = 'https://example.com'
+    user = user_factory()
+
+    with mock.patch('oidc_apis.id_token.sys') as sys_mock:
+        id_token = create_id_token(user, aud='test', scope=['email'])
+
+    assert id_token['scopes'] == ['email']
+    assert not sys_mock._getframe.called
+
+
+def test_process_id_token_reads_only_caller_frame(mock_userinfo):
+    with mock.patch('inspect.stack') as stack, mock.patch('oidc_apis.id_token.sys') as sys_mock:
+        sys_mock._getframe.return_value.f_locals = {'scope': ['profile']}
+        assert process_id_token({}, user=None) == {'scopes': ['profile']}
+
+    # Walking the whole stack with inspect.stack() would take
+    # milliseconds per call, reading the caller's frame microseconds
+    assert not stack.called
+    sys_mock._getframe.assert_called_once_with(1)
+    assert mock_userinfo.call_count == 1
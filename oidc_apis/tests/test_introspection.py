@@ -0,0 +1,97 @@
+import base64
+from urllib.parse import quote_plus
+
+import pytest
+from django.test import RequestFactory
+
+from oidc_apis.access_tokens import encode_access_token
+
+
+@pytest.fixture()
+def introspection_setup(rsa_key, user_factory, oidcclient_factory, api_factory, api_scope_factory, token_factory):
+    client = oidcclient_factory()
+    api = api_factory()
+    api_scope = api_scope_factory(api=api, allowed_apps=[client])
+    token = token_factory(user=user_factory(), client=client, scope=['openid', api_scope.identifier])
+    return (api, api_scope, token)
+
+
+def get_auth(client):
+    credentials = '{}:{}'.format(quote_plus(client.client_id), quote_plus(client.client_secret))
+    return 'Basic ' + base64.b64encode(credentials.encode('utf-8')).decode('ascii')
+
+
+def introspect(client, api, tokens):
+    return client.post('/introspect/', {'token': tokens}, HTTP_AUTHORIZATION=get_auth(api.oidc_client))
+
+
+@pytest.mark.django_db
+def test_introspect_active_token(client, introspection_setup):
+    (api, api_scope, token) = introspection_setup
+
+    response = introspect(client, api, [token.access_token])
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data['active'] is True
+    assert data['client_id'] == token.client.client_id
+    assert data['sub'] == str(token.user.uuid)
+    assert data['scope'] == 'openid ' + api_scope.identifier
+    assert data['aud'] == api.oidc_client.client_id
+    assert data[api.domain.identifier] == [api_scope.relative_identifier]
+    assert 'max-age=' in response['Cache-Control']
+
+
+@pytest.mark.django_db
+def test_introspect_batch(client, introspection_setup):
+    (api, api_scope, token) = introspection_setup
+
+    jwt_value = encode_access_token(token, RequestFactory().get('/'))
+
+    response = introspect(client, api, [token.access_token, 'unknown', jwt_value])
+
+    results = response.json()['tokens']
+    assert [result['active'] for result in results] == [True, False, True]
+    assert results[2] == results[0]
+
+
+@pytest.mark.django_db
+def test_introspect_is_cached_until_revoked(client, introspection_setup, django_assert_num_queries):
+    (api, api_scope, token) = introspection_setup
+    introspect(client, api, [token.access_token])
+
+    # Only the client authentication hits the database
+    with django_assert_num_queries(1):
+        assert introspect(client, api, [token.access_token]).json()['active'] is True
+
+    token.delete()
+
+    assert introspect(client, api, [token.access_token]).json()['active'] is False
+
+
+@pytest.mark.django_db
+def test_introspect_requires_client_authentication(client, introspection_setup):
+    (api, api_scope, token) = introspection_setup
+
+    response = client.post('/introspect/', {'token': token.access_token})
+    assert response.status_code == 401
+
+    response = client.post('/introspect/', {'token': token.access_token},
+                           HTTP_AUTHORIZATION=get_auth(token.client))
+    assert response.status_code == 401
+
+
+@pytest.mark.django_db
+def test_introspect_token_of_other_resource_server(client, introspection_setup, api_factory):
+    (api, api_scope, token) = introspection_setup
+    other_api = api_factory()
+
+    assert introspect(client, other_api, [token.access_token]).json() == {'active': False}
+
+    token.client.client_type = 'confidential'
+    token.client.client_secret = 'secret'
+    token.client.save()
+    response = client.post('/introspect/', {'token': token.access_token}, HTTP_AUTHORIZATION=get_auth(token.client))
+    data = response.json()
+    assert data['active'] is True
+    assert 'aud' not in data
@@ -0,0 +1,56 @@
+import pytest
+
+from oidc_apis.registry import get_api_scope_registry
+
+
+@pytest.mark.django_db
+def test_registry_groups_allowed_scopes_by_api(api_factory, api_scope_factory, oidcclient_factory):
+    client = oidcclient_factory()
+    other_client = oidcclient_factory()
+    api1 = api_factory(required_scopes=['email'])
+    api2 = api_factory()
+    scope1 = api_scope_factory(api=api1, allowed_apps=[client])
+    scope2 = api_scope_factory(api=api1, specifier='readonly', allowed_apps=[client])
+    scope3 = api_scope_factory(api=api2, allowed_apps=[other_client])
+
+    registry = get_api_scope_registry()
+    scopes_by_api = registry.get_api_scopes_by_api(
+        ['openid', scope1.identifier, scope2.identifier, scope3.identifier], client.pk)
+
+    assert list(scopes_by_api.keys()) == [api1.identifier]
+    entries = scopes_by_api[api1.identifier]
+    assert [x.identifier for x in entries] == [scope1.identifier, scope2.identifier]
+    assert [x.relative_identifier for x in entries] == [api1.name, api1.name + '.readonly']
+    assert entries[0].api.domain.identifier == api1.domain.identifier
+    assert entries[0].api.required_scopes == ('email',)
+    assert entries[0].api.oidc_client == api1.oidc_client
+
+
+@pytest.mark.django_db
+def test_registry_is_loaded_once(django_assert_num_queries, api_scope_factory, oidcclient_factory):
+    client = oidcclient_factory()
+    scope = api_scope_factory(allowed_apps=[client])
+    get_api_scope_registry()
+
+    with django_assert_num_queries(0):
+        registry = get_api_scope_registry()
+        registry.get_api_scopes_by_api([scope.identifier], client.pk)
+
+
+@pytest.mark.django_db
+def test_registry_is_reloaded_on_changes(api_scope_factory, oidcclient_factory):
+    client = oidcclient_factory()
+    scope = api_scope_factory()
+
+    registry = get_api_scope_registry()
+    assert not registry.get_api_scopes_by_api([scope.identifier], client.pk)
+
+    scope.allowed_apps.add(client)
+
+    registry = get_api_scope_registry()
+    assert registry.get_api_scopes_by_api([scope.identifier], client.pk)
+
+    scope.api.delete()
+
+    registry = get_api_scope_registry()
+    assert not registry.get_api_scopes([scope.identifier])
@@ -0,0 +1,53 @@
+import pytest
+
+from oidc_apis.scope_catalog import get_scope_catalog
+from oidc_apis.scopes import CombinedScopeClaims
+
+
+@pytest.fixture()
+def translated_scope(api_factory, api_scope_factory):
+    api = api_factory(required_scopes=['email', 'profile'])
+    api_scope = api_scope_factory(api=api, name='Nimi', description='Kuvaus')
+    api_scope.set_current_language('en')
+    api_scope.name = 'Name'
+    api_scope.description = 'Description'
+    api_scope.save()
+    return api_scope
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('language, name, description', (
+    ('fi', 'Nimi', 'Kuvaus'),
+    ('en', 'Name', 'Description'),
+    ('sv', 'Nimi', 'Kuvaus'),  # Falls back to the default language
+))
+def test_scope_catalog_translations(translated_scope, language, name, description):
+    catalog = get_scope_catalog(language)
+
+    assert catalog.get_scopes_info(['openid', translated_scope.identifier]) == [{
+        'scope': translated_scope.identifier,
+        'name': name,
+        'description': description,
+    }]
+    assert catalog.get_required_scopes([translated_scope.identifier]) == {'email', 'profile'}
+
+
+@pytest.mark.django_db
+def test_scope_catalog_is_cached(django_assert_num_queries, translated_scope):
+    get_scope_catalog()
+
+    with django_assert_num_queries(0):
+        scopes_info = CombinedScopeClaims.get_scopes_info([translated_scope.identifier])
+
+    assert [x['scope'] for x in scopes_info] == [translated_scope.identifier, 'email', 'profile']
+
+
+@pytest.mark.django_db
+def test_scope_catalog_is_rebuilt_on_translation_change(translated_scope):
+    get_scope_catalog('en')
+
+    translation = translated_scope.translations.get(language_code='en')
+    translation.name = 'Changed'
+    translation.save()
+
+    assert get_scope_catalog('en').get_scopes_info([translated_scope.identifier])[0]['name'] == 'Changed'
@@ -0,0 +1,46 @@
+import copy
+from unittest import mock
+
+import pytest
+
+from oidc_apis.scopes import CombinedScopeClaims, claims_memo, get_userinfo_by_scopes
+
+
+@pytest.mark.django_db
+def test_claims_are_memoized_within_memo(django_assert_num_queries, user_factory):
+    user = user_factory(first_name='Test', last_name='User')
+
+    with claims_memo():
+        userinfo1 = get_userinfo_by_scopes(user, ['openid', 'profile', 'email'])
+        with django_assert_num_queries(0):
+            userinfo2 = get_userinfo_by_scopes(user, ['email', 'profile', 'openid'])
+
+    assert userinfo1 == userinfo2
+    assert userinfo1['given_name'] == 'Test'
+
+
+@pytest.mark.django_db
+def test_memoized_claims_are_copies(user_factory):
+    user = user_factory(first_name='Test')
+
+    with claims_memo():
+        get_userinfo_by_scopes(user, ['profile'])['given_name'] = 'Changed'
+        userinfo = get_userinfo_by_scopes(user, ['profile'])
+
+    assert userinfo['given_name'] == 'Test'
+
+
+@pytest.mark.django_db
+def test_memoized_claims_are_built_once(user_factory):
+    user = user_factory()
+
+    with mock.patch.object(CombinedScopeClaims, '_create_response_dic', autospec=True,
+                           side_effect=lambda claims: {'sub': 'test'}) as create_mock, \
+            mock.patch('oidc_apis.scopes.copy') as copy_mock:
+        copy_mock.deepcopy.side_effect = copy.deepcopy
+        with claims_memo():
+            get_userinfo_by_scopes(user, ['openid'])
+            get_userinfo_by_scopes(user, ['openid'])
+
+    assert create_mock.call_count == 1
+    assert copy_mock.deepcopy.call_count == 2
@@ -0,0 +1,52 @@
+from unittest import mock
+
+import pytest
+from Cryptodome.PublicKey import RSA
+from django.core.management import call_command
+from oidc_provider.lib.utils.token import decode_id_token
+from oidc_provider.models import Client, RSAKey
+
+from oidc_apis import signing
+
+
+@pytest.mark.django_db
+def test_signed_token_can_be_verified(rsa_key):
+    client = Client(client_id='test-client', jwt_alg='RS256')
+    payload = {'sub': 'test', 'aud': client.client_id}
+
+    encoded = signing.encode_id_token(payload, client)
+
+    assert decode_id_token(encoded, client) == payload
+
+
+@pytest.mark.django_db
+def test_keys_are_parsed_once(rsa_key):
+    client = Client(client_id='test-client', jwt_alg='RS256')
+
+    with mock.patch('oidc_apis.signing.importKey', wraps=signing.importKey) as import_key:
+        for _ in range(3):
+            signing.encode_id_token({'sub': 'test'}, client)
+
+    assert import_key.call_count == 1
+
+
+@pytest.mark.django_db
+def test_keys_are_reloaded_on_change(rsa_key):
+    key_ring = signing.get_signing_key_ring()
+    assert list(key_ring.keys_by_kid.keys()) == [rsa_key.kid]
+
+    new_key = RSAKey.objects.create(key=RSA.generate(1024).exportKey('PEM').decode('ascii'))
+    rsa_key.delete()
+
+    key_ring = signing.get_signing_key_ring()
+    assert list(key_ring.keys_by_kid.keys()) == [new_key.kid]
+    assert key_ring.get_key(new_key.kid) is key_ring.keys[0]
+
+
+@pytest.mark.django_db
+def test_benchmark_command(rsa_key, capsys):
+    call_command('benchmark_api_token_signing', count=2)
+
+    output = capsys.readouterr().out
+    assert 'uncached:' in output
+    assert 'cached:' in output
@@ -1,4 +1,8 @@
+import base64
 from collections import OrderedDict
+from urllib.parse import unquote_plus
+
+from users.sessions import refresh_session
 
 
 def combine_uniquely(iterable1, iterable2):
@@ -16,12 +20,35 @@ def combine_uniquely(iterable1, iterable2):
 
 
 def after_userlogin_hook(request, user, client):
-    """Marks Django session modified
+    """Refreshes Django session
 
     The purpose of this function is to keep the session used by the
     oidc-provider fresh. This is achieved by pointing
-    'OIDC_AFTER_USERLOGIN_HOOK' setting to this."""
-    request.session.modified = True
+    'OIDC_AFTER_USERLOGIN_HOOK' setting to this.  The session is saved
+    only when its expiry has aged enough, see `refresh_session`."""
+    refresh_session(request)
 
     # Return None to continue the login flow
     return None
+
+
+def get_client_credentials(request):
+    """
+    Get the client credentials of a request to a client endpoint.
+
+    The credentials are read from the HTTP Basic Authorization header or
+    from the client_id and client_secret POST parameters.
+
+    :type request: django.http.HttpRequest
+    :rtype: (str, str)
+    :return: The client_id and the client_secret, empty if not given
+    """
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(auth_header) == 2 and auth_header[0].lower() == 'basic':
+        try:
+            decoded = base64.b64decode(auth_header[1]).decode('utf-8')
+        except (ValueError, UnicodeError):
+            return ('', '')
+        (client_id, _, client_secret) = decoded.partition(':')
+        return (unquote_plus(client_id), unquote_plus(client_secret))
+    return (request.POST.get('client_id', ''), request.POST.get('client_secret', ''))
@@ -1,8 +1,15 @@
+from django.conf import settings
 from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from oidc_provider.lib.utils.oauth2 import protected_resource_view
+from oidc_provider.models import Client
 
-from .api_tokens import get_api_tokens_by_access_token
+from .access_tokens import protected_resource_view
+from .api_tokens import UnknownAudience, get_api_tokens_by_access_token
+from .introspection import get_remaining_lifetime, introspect_tokens
+from .utils import get_client_credentials
 
 
 @require_http_methods(['GET', 'POST'])
@@ -11,12 +18,65 @@ def get_api_tokens_view(request, token, *args, **kwargs):
     """
     Get the authorized API Tokens.
 
-    :type token: oidc_provider.models.Token
+    The tokens can be limited to some APIs with the audience (or api)
+    parameter, which may be given several times.
+
+    :type token: oidc_provider.models.Token|LocalAccessToken
     :rtype: JsonResponse
     """
-    api_tokens = get_api_tokens_by_access_token(token, request=request)
-    response = JsonResponse(api_tokens, status=200)
+    params = request.POST if request.method == 'POST' else request.GET
+    audiences = params.getlist('audience') + params.getlist('api')
+    try:
+        api_tokens = get_api_tokens_by_access_token(
+            token, request=request, audiences=(audiences or None))
+    except UnknownAudience as error:
+        response = JsonResponse({
+            'error': 'invalid_audience',
+            'error_description': str(error),
+        }, status=400)
+    else:
+        response = JsonResponse(api_tokens, status=200)
     response['Access-Control-Allow-Origin'] = '*'
     response['Cache-Control'] = 'no-store'
     response['Pragma'] = 'no-cache'
     return response
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+def introspect_tokens_view(request):
+    """
+    Introspect access tokens (RFC 7662).
+
+    The caller authenticates as an OIDC client with HTTP Basic auth or
+    with client_id and client_secret parameters.  Several tokens can be
+    introspected at once by repeating the token parameter, in which case
+    the results are returned as a list in the "tokens" field.
+
+    :rtype: JsonResponse
+    """
+    resource_server = _authenticate_client(request)
+    if not resource_server:
+        response = JsonResponse({'error': 'invalid_client'}, status=401)
+        response['WWW-Authenticate'] = 'Basic realm="introspection"'
+        return response
+
+    values = request.POST.getlist('token')
+    if not values or len(values) > settings.TOKEN_INTROSPECTION_MAX_TOKENS:
+        return JsonResponse({'error': 'invalid_request'}, status=400)
+
+    results = introspect_tokens(values, resource_server)
+    data = results[0] if len(values) == 1 else {'tokens': results}
+    response = JsonResponse(data, status=200)
+    lifetimes = [get_remaining_lifetime(result) for result in results if result['active']]
+    max_age = min([settings.TOKEN_INTROSPECTION_MAX_AGE] + lifetimes)
+    patch_cache_control(response, private=True, max_age=max_age)
+    return response
+
+
+def _authenticate_client(request):
+    (client_id, client_secret) = get_client_credentials(request)
+    client = Client.objects.filter(client_id=client_id, client_type='confidential').first()
+    if not client or not client_secret or not constant_time_compare(client.client_secret, client_secret):
+        return None
+    return client
@@ -8,7 +8,8 @@ from rest_framework import generics, mixins, permissions, serializers, views
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 
-from hkijwt.models import AppToAppPermission
+from hkijwt.cache import cache_jwt, get_cached_jwt
+from hkijwt.permissions import has_app_to_app_permission
 
 logger = logging.getLogger(__name__)
 
@@ -69,12 +70,16 @@ class GetJWTView(views.APIView):
     def get(self, request, format=None):
         requester_app = request.auth.application
         target_app = request.query_params.get('target_app', '').strip()
+        target_app_id = target_app
+
+        cached = get_cached_jwt(request.auth, target_app_id)
+        if cached:
+            return Response(cached)
+
         if target_app:
             qs = get_application_model().objects.all()
             target_app = generics.get_object_or_404(qs, client_id=target_app)
-            try:
-                AppToAppPermission.objects.get(requester=requester_app, target=target_app)
-            except AppToAppPermission.DoesNotExist:
+            if not has_app_to_app_permission(requester_app, target_app):
                 raise PermissionDenied("no permissions for app %s" % target_app)
         else:
             target_app = requester_app
@@ -97,4 +102,5 @@ class GetJWTView(views.APIView):
         encoded = jwt.encode(payload, secret, algorithm='HS256')
 
         ret = dict(token=encoded, expires_at=request.auth.expires)
+        cache_jwt(request.auth, target_app_id, ret)
         return Response(ret)
@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.db import transaction
+
+
+def get_cache():
+    """
+    Get the cache shared by all Tunnistamo processes.
+
+    :rtype: django.core.cache.backends.base.BaseCache
+    """
+    return caches[settings.TUNNISTAMO_CACHE]
+
+
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Warn if the cache shared between processes is process local.
+
+    The versions, the revocation list and the cached tokens must be seen
+    by every process, or changes made in one process don't reach the
+    others until the cached data expires.
+    """
+    if settings.DEBUG:
+        return []
+    backend = settings.CACHES.get(settings.TUNNISTAMO_CACHE, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHE_BACKENDS:
+        return []
+    return [checks.Warning(
+        'TUNNISTAMO_CACHE points to a process local cache ({}).'.format(backend),
+        hint='Configure a cache shared by all processes, e.g. Memcached or Redis, '
+             'in CACHES and point TUNNISTAMO_CACHE to it.',
+        id='tunnistamo.W001',
+    )]
+
+
+def get_version(name):
+    """
+    Get the current version of a versioned namespace.
+
+    Versions are stored in the shared cache, so that every process sees
+    the same value.  A missing version is initialized to a time based
+    value, which makes sure that a cache flush never brings back a
+    version number that some process might still have in memory.
+
+    :type name: str
+    :rtype: int
+    """
+    cache = get_cache()
+    key = _get_version_key(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _get_initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    """
+    Bump the version of a versioned namespace.
+
+    The version is bumped right away and once more when the current
+    transaction is committed.  The second bump makes sure that another
+    process, which reloaded its data between the first bump and the
+    commit, doesn't keep on using the uncommitted state.
+
+    :type name: str
+    """
+    _increment_version(name)
+    transaction.on_commit(lambda: _increment_version(name))
+
+
+class VersionedValue(object):
+    """
+    Process local value which is reloaded when its version changes.
+
+    The value is loaded with the given loader function on first access
+    and reloaded whenever the version of the namespace in the shared
+    cache differs from the version of the loaded value.
+    """
+    def __init__(self, name, loader):
+        """
+        :type name: str
+        :param name: Name of the version namespace
+        :type loader: Callable[[], Any]
+        :param loader: Function for loading the value
+        """
+        self.name = name
+        self.loader = loader
+        self._loaded = (None, None)
+
+    def get(self):
+        """
+        Get an up-to-date value.
+        """
+        version = get_version(self.name)
+        (loaded_version, value) = self._loaded
+        if loaded_version != version:
+            value = self.loader()
+            self._loaded = (version, value)
+        return value
+
+    def invalidate(self):
+        """
+        Make all processes reload the value.
+        """
+        bump_version(self.name)
+
+
+class LRUCache(object):
+    """
+    Process local least recently used cache with per item timeouts.
+    """
+    def __init__(self, max_size):
+        """
+        :type max_size: int
+        :param max_size: Maximum number of items to keep
+        """
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            (expires_at, value) = self._items.get(key, (None, default))
+            if expires_at is None:
+                return default
+            if expires_at <= time.monotonic():
+                del self._items[key]
+                return default
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        """
+        :type timeout: float
+        :param timeout: Number of seconds to keep the item
+        """
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = (time.monotonic() + timeout, value)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+def _increment_version(name):
+    cache = get_cache()
+    key = _get_version_key(name)
+    try:
+        cache.incr(key)
+    except ValueError:  # Version is not in the cache
+        cache.add(key, _get_initial_version(), timeout=None)
+
+
+def _get_version_key(name):
+    return 'tunnistamo:version:{}'.format(name)
+
+
+def _get_initial_version():
+    return int(time.time() * 1000)
@@ -1,3 +1,6 @@
+from users.userinfo import get_userinfo_snapshot
+
+
 def sub_generator(user):
     return str(user.uuid)
 
@@ -13,21 +16,16 @@ def get_userinfo(claims, user):
     :type user: django.contrib.auth.models.AbstractUser
     :rtype: dict
     """
+    snapshot = get_userinfo_snapshot(user)
+
     # Name
-    claims['given_name'] = user.first_name
-    claims['family_name'] = user.last_name
-    claims['name'] = user.get_full_name()
+    claims['given_name'] = snapshot['first_name']
+    claims['family_name'] = snapshot['last_name']
+    claims['name'] = snapshot['full_name']
 
     # Email
-    email_address = (
-        user.emailaddress_set.filter(primary=True).first()
-        if hasattr(user, 'emailaddress_set') else None)
-    if email_address:
-        claims['email'] = email_address.email
-        claims['email_verified'] = email_address.verified
-    else:
-        claims['email'] = user.email
-        claims['email_verified'] = False
+    claims['email'] = snapshot['email']
+    claims['email_verified'] = snapshot['email_verified']
 
     # Username
     #
@@ -38,7 +36,7 @@ def get_userinfo(claims, user):
     # Note 2: Nickname must be set, because otherwise django-oidc-provider will
     # use user.username as a nickname
     claims['preferred_username'] = None
-    claims['nickname'] = user.get_short_name()
+    claims['nickname'] = snapshot['short_name']
 
     # Locale (None for now, but might want to set this in the future)
     claims['locale'] = None
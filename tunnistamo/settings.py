@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/1.7/ref/settings/
 """
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+import datetime
 import os
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
@@ -70,6 +71,7 @@ MIDDLEWARE_CLASSES = (
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'oidc_apis.middleware.ClaimsMemoMiddleware',
 )
 
 AUTHENTICATION_BACKENDS = (
@@ -204,6 +206,49 @@ LOGGING = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Cache used for sharing the registry versions and cached tokens between
+# processes.  Point this to a shared cache (e.g. Memcached or Redis) in
+# multi-process deployments, otherwise the check tunnistamo.W001 warns
+# about it when DEBUG is off.
+TUNNISTAMO_CACHE = 'default'
+
+# Number of seconds to cache the login methods of a client
+LOGIN_METHODS_CACHE_TIMEOUT = 3600
+
+# Number of seconds to cache the rendered login page in the shared cache
+# and to let reverse proxies and browsers cache it
+LOGIN_PAGE_CACHE_TIMEOUT = 300
+LOGIN_PAGE_CACHE_MAX_AGE = 60
+
+# Number of seconds to keep the userinfo claims snapshot of a user.  The
+# snapshots are refreshed on changes, the timeout only bounds the life of
+# a snapshot which missed a refresh.
+USERINFO_SNAPSHOT_TIMEOUT = 24 * 3600
+
+# Additional token signing certificates of the ADFS providers, by the
+# provider id.  The certificates can be given as a list of base64 encoded
+# certificates or as a path to a federation metadata file.  They are
+# tried before the certificate embedded in the provider.
+ADFS_SIGNING_CERTIFICATES = {}
+ADFS_METADATA_FILES = {}
+
+# Outgoing requests to the upstream identity providers.  The timeout is
+# given as (connect timeout, read timeout) in seconds.  Only failed
+# connection attempts are retried.
+UPSTREAM_HTTP_POOL_SIZE = 10
+UPSTREAM_HTTP_TIMEOUT = (3.05, 10)
+UPSTREAM_HTTP_RETRIES = 2
+UPSTREAM_HTTP_RETRY_BACKOFF = 0.2
+# Ids of the stock allauth providers which should also use the pooled
+# sessions, e.g. ['facebook', 'github', 'google']
+UPSTREAM_HTTP_POOL_ALLAUTH_PROVIDERS = []
+
 CORS_ORIGIN_ALLOW_ALL = True
 
 OAUTH2_PROVIDER_APPLICATION_MODEL = 'users.Application'
@@ -213,11 +258,39 @@ OAUTH2_PROVIDER = {
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'oauth2_provider.contrib.rest_framework.OAuth2Authentication',
+        'users.authentication.CachedOAuth2Authentication',
     )
 }
+
+# Validated access tokens of the REST API are cached in the shared cache
+# for TOKEN_AUTH_CACHE_TIMEOUT seconds and in a process local LRU cache
+# of TOKEN_AUTH_CACHE_SIZE items for TOKEN_AUTH_CACHE_LOCAL_TIMEOUT
+# seconds.  Revoked tokens may be accepted by other processes until
+# their local cache entry times out.
+TOKEN_AUTH_CACHE_TIMEOUT = 300
+TOKEN_AUTH_CACHE_LOCAL_TIMEOUT = 10
+TOKEN_AUTH_CACHE_SIZE = 1000
+
+# Token introspection results are cached for at most
+# TOKEN_INTROSPECTION_CACHE_TIMEOUT seconds and the callers may cache
+# them for at most TOKEN_INTROSPECTION_MAX_AGE seconds
+TOKEN_INTROSPECTION_CACHE_TIMEOUT = 300
+TOKEN_INTROSPECTION_MAX_AGE = 60
+TOKEN_INTROSPECTION_MAX_TOKENS = 100
 CSRF_COOKIE_NAME = 'sso-csrftoken'
 SESSION_COOKIE_NAME = 'sso-sessionid'
+# Save a refreshed session only if its expiry would move forward by more
+# than this fraction of the session lifetime
+SESSION_REFRESH_FRACTION = 0.1
+# Set SESSION_ENGINE to 'users.session_store' to read the sessions from
+# the session cache (SESSION_CACHE_ALIAS), which must then be shared by
+# all the processes.  The session keys listed here are cached separately
+# and loaded only when used.
+SESSION_LAZY_KEYS = ['login_methods']
+
+# Expired OIDC tokens are kept this long by the prune_tokens command,
+# since their refresh tokens can still be used
+TOKEN_PRUNE_OIDC_TOKEN_RETENTION = datetime.timedelta(days=30)
 
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_SCHEME', 'https')
 
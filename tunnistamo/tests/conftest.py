@@ -0,0 +1,28 @@
+import datetime
+
+import pytest
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from oauth2_provider.models import AccessToken
+
+from oidc_apis.tests.conftest import api_domain_factory, api_factory, api_scope_factory, rsa_key, token_factory  # noqa
+from users.tests.conftest import (  # noqa
+    application_factory, clear_cache, loginmethod_factory, oidcclient_factory, socialaccount_factory, socialapp_factory,
+    user_factory
+)
+
+
+@pytest.fixture()  # noqa: F811
+def accesstoken_factory(user_factory, application_factory):  # noqa
+    def make_instance(**args):
+        if 'user' not in args:
+            args['user'] = user_factory()
+        if 'application' not in args:
+            args['application'] = application_factory()
+        args.setdefault('token', get_random_string())
+        args.setdefault('expires', timezone.now() + datetime.timedelta(hours=1))
+        args.setdefault('scope', 'read write')
+
+        return AccessToken.objects.create(**args)
+
+    return make_instance
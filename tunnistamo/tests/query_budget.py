@@ -0,0 +1,124 @@
+"""
+Pytest plugin for keeping the SQL query counts of the endpoints in check.
+
+The `query_budget` fixture records the queries run while handling a
+request and compares their count to the budget of the endpoint and
+scenario in query_budgets.json.  A test exceeding its budget fails with
+the list of the queries.  Run the whole test suite with
+--update-query-budgets to regenerate the budget file from the measured
+counts instead.
+"""
+import json
+import os
+from contextlib import contextmanager
+
+import pytest
+
+BUDGETS_FILE = os.path.join(os.path.dirname(__file__), 'query_budgets.json')
+
+
+class QueryBudgets(object):
+    def __init__(self, path, update=False):
+        self.path = path
+        self.update = update
+        self.measured = {}
+        with open(path) as fp:
+            self.budgets = json.load(fp)
+
+    def check(self, endpoint, scenario, queries):
+        """
+        Check the queries of a request against the budget.
+
+        :type endpoint: str
+        :type scenario: str
+        :type queries: list[dict]
+        :param queries: The captured queries with their SQL and time
+        """
+        if self.update:
+            key = (endpoint, scenario)
+            self.measured[key] = max(self.measured.get(key, 0), len(queries))
+            return
+
+        budget = self.budgets.get(endpoint, {}).get(scenario)
+        if budget is None:
+            pytest.fail(
+                'No query budget for {} ({}), add it to {} or run pytest '
+                'with --update-query-budgets'.format(endpoint, scenario, self.path),
+                pytrace=False)
+        if len(queries) > budget:
+            pytest.fail(
+                'Query budget exceeded for {} ({}): {} queries, budget {}\n{}'.format(
+                    endpoint, scenario, len(queries), budget, _format_queries(queries)),
+                pytrace=False)
+
+    def save(self):
+        """
+        Replace the budgets with the measured counts.
+        """
+        budgets = {}
+        for ((endpoint, scenario), count) in self.measured.items():
+            budgets.setdefault(endpoint, {})[scenario] = count
+        self.budgets = budgets
+        with open(self.path, 'w') as fp:
+            json.dump(self.budgets, fp, indent=2, sort_keys=True)
+            fp.write('\n')
+
+
+def _format_queries(queries):
+    return '\n'.join(
+        '{}. {}'.format(number, query['sql'])
+        for (number, query) in enumerate(queries, 1))
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--update-query-budgets', action='store_true', default=False,
+        help='Write the measured query counts to the query budget file')
+
+
+def pytest_configure(config):
+    update = config.getoption('update_query_budgets')
+    if update and _is_distributed(config):
+        raise pytest.UsageError('--update-query-budgets cannot be used with pytest-xdist')
+    config.query_budgets = QueryBudgets(BUDGETS_FILE, update=update)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    query_budgets = session.config.query_budgets
+    if not query_budgets.update:
+        return
+    reporter = session.config.pluginmanager.get_plugin('terminalreporter')
+    if exitstatus != 0 or not query_budgets.measured:
+        reporter.write_line('Query budgets not updated, since the tests failed or measured nothing')
+        return
+    query_budgets.save()
+    reporter.write_line('Query budgets updated in {}'.format(query_budgets.path))
+
+
+def _is_distributed(config):
+    # Each xdist worker would measure and write only its share of the tests
+    return (
+        getattr(config.option, 'numprocesses', None) or getattr(config.option, 'dist', 'no') != 'no' or
+        hasattr(config, 'workerinput') or hasattr(config, 'slaveinput'))
+
+
+@pytest.fixture()
+def query_budget(request):
+    """
+    Check the queries of a request against the budget of the endpoint.
+
+    Usage::
+
+        with query_budget('/user/', '20 AD groups'):
+            response = client.get('/user/', ...)
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    @contextmanager
+    def check(endpoint, scenario='default'):
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        request.config.query_budgets.check(endpoint, scenario, context.captured_queries)
+
+    return check
@@ -0,0 +1,16 @@
+import pytest
+
+from tunnistamo.cache import check_shared_cache
+
+
+@pytest.mark.parametrize('backend,debug,warns', [
+    ('django.core.cache.backends.locmem.LocMemCache', False, True),
+    ('django.core.cache.backends.locmem.LocMemCache', True, False),
+    ('django.core.cache.backends.memcached.PyLibMCCache', False, False),
+])
+def test_check_shared_cache(settings, backend, debug, warns):
+    settings.DEBUG = debug
+    settings.CACHES = {'default': {'BACKEND': backend}}
+    settings.TUNNISTAMO_CACHE = 'default'
+
+    assert [error.id for error in check_shared_cache(None)] == (['tunnistamo.W001'] if warns else [])
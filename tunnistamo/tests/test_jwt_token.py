@@ -0,0 +1,79 @@
+from unittest import mock
+
+import jwt
+import pytest
+from django.db import IntegrityError, transaction
+
+from hkijwt.models import AppToAppPermission
+from hkijwt.permissions import has_app_to_app_permission
+
+
+def get_jwt_token(client, access_token, target_app=None):
+    params = {'target_app': target_app.client_id} if target_app else {}
+    with mock.patch('tunnistamo.api.jwt.encode', wraps=jwt.encode) as encode:
+        response = client.get(
+            '/jwt-token/', params,
+            HTTP_AUTHORIZATION='Bearer {}'.format(access_token.token))
+    return (response, encode.call_count)
+
+
+@pytest.mark.django_db
+def test_jwt_token_is_cached(client, accesstoken_factory):
+    access_token = accesstoken_factory()
+
+    (response1, encoded1) = get_jwt_token(client, access_token)
+    (response2, encoded2) = get_jwt_token(client, access_token)
+
+    assert response1.status_code == response2.status_code == 200
+    assert response1.data == response2.data
+    assert (encoded1, encoded2) == (1, 0)
+
+
+@pytest.mark.django_db
+def test_jwt_token_cache_is_invalidated_on_user_change(client, accesstoken_factory):
+    access_token = accesstoken_factory()
+    get_jwt_token(client, access_token)
+
+    access_token.user.last_name = 'Changed'
+    access_token.user.save()
+    (response, encoded) = get_jwt_token(client, access_token)
+
+    assert encoded == 1
+    payload = jwt.decode(response.data['token'], verify=False)
+    assert payload['last_name'] == 'Changed'
+
+
+@pytest.mark.django_db
+def test_jwt_token_cache_is_invalidated_on_permission_change(client, accesstoken_factory, application_factory):
+    access_token = accesstoken_factory()
+    target_app = application_factory()
+    permission = AppToAppPermission.objects.create(requester=access_token.application, target=target_app)
+
+    (response, encoded) = get_jwt_token(client, access_token, target_app)
+    assert response.status_code == 200
+
+    permission.delete()
+    (response, encoded) = get_jwt_token(client, access_token, target_app)
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_app_to_app_permission_matrix(django_assert_num_queries, application_factory):
+    (requester, target, other) = [application_factory() for _ in range(3)]
+    AppToAppPermission.objects.create(requester=requester, target=target)
+    has_app_to_app_permission(requester, target)
+
+    with django_assert_num_queries(0):
+        assert has_app_to_app_permission(requester, target)
+        assert not has_app_to_app_permission(requester, other)
+        assert not has_app_to_app_permission(target, requester)
+
+
+@pytest.mark.django_db
+def test_app_to_app_permission_is_unique(application_factory):
+    (requester, target) = [application_factory() for _ in range(2)]
+    AppToAppPermission.objects.create(requester=requester, target=target)
+
+    with pytest.raises(IntegrityError):
+        with transaction.atomic():
+            AppToAppPermission.objects.create(requester=requester, target=target)
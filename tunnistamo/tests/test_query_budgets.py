@@ -0,0 +1,140 @@
+"""
+Query budgets of the endpoints, see query_budget.py.
+
+The tests commit their transactions, so that the caches which are filled
+in transaction.on_commit are measured like in production.
+"""
+import datetime
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from allauth.socialaccount.helpers import complete_social_login
+from allauth.socialaccount.models import SocialAccount, SocialLogin, SocialToken
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.test import RequestFactory
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+REDIRECT_URI = 'https://example.com/callback'
+
+
+def get_ad_group_names(count):
+    return ['Group {}'.format(number) for number in range(count)]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('api_count', (1, 5))
+def test_api_tokens_query_budget(client, query_budget, rsa_key, user_factory, oidcclient_factory,
+                                 api_scope_factory, token_factory, api_count):
+    oidc_client = oidcclient_factory()
+    api_scopes = [api_scope_factory(allowed_apps=[oidc_client]) for i in range(api_count)]
+    token = token_factory(
+        user=user_factory(), client=oidc_client,
+        scope=['openid'] + [api_scope.identifier for api_scope in api_scopes])
+
+    for state in ('cold', 'cached'):
+        with query_budget('/api-tokens/', '{} APIs, {}'.format(api_count, state)):
+            response = client.get('/api-tokens/', HTTP_AUTHORIZATION='Bearer ' + token.access_token)
+        assert response.status_code == 200
+        assert len(response.json()) == api_count
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('ad_group_count', (0, 20))
+@pytest.mark.parametrize('path', ('/user/', '/jwt-token/'))
+def test_user_endpoints_query_budget(client, query_budget, accesstoken_factory, application_factory,
+                                     path, ad_group_count):
+    access_token = accesstoken_factory(application=application_factory(include_ad_groups=True))
+    access_token.user.update_ad_groups(get_ad_group_names(ad_group_count))
+
+    with query_budget(path, '{} AD groups'.format(ad_group_count)):
+        response = client.get(path, HTTP_AUTHORIZATION='Bearer ' + access_token.token)
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('provider_ids', (
+    ['facebook', 'github'],
+    ['facebook', 'github', 'google', 'tumblr', 'yletunnus', 'helsinki_adfs'],
+))
+def test_login_query_budget(client, query_budget, loginmethod_factory, provider_ids):
+    for provider_id in provider_ids:
+        loginmethod_factory(provider_id=provider_id)
+
+    for state in ('cold', 'cached'):
+        with query_budget('/login/', '{} login methods, {}'.format(len(provider_ids), state)):
+            response = client.get('/login/')
+        assert response.status_code == 200
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('api_count', (0, 5))
+def test_oidc_endpoints_query_budget(client, query_budget, rsa_key, user_factory, oidcclient_factory,
+                                     api_scope_factory, api_count):
+    oidc_client = oidcclient_factory(
+        client_type='confidential', client_secret=get_random_string(), response_type='code',
+        redirect_uris=[REDIRECT_URI], require_consent=False)
+    api_scopes = [api_scope_factory(allowed_apps=[oidc_client]) for i in range(api_count)]
+    scope = ['openid', 'profile', 'email'] + [api_scope.identifier for api_scope in api_scopes]
+    client.force_login(user_factory())
+    scenario = '{} APIs'.format(api_count)
+
+    with query_budget('/openid/authorize/', scenario):
+        response = client.get('/openid/authorize/', {
+            'client_id': oidc_client.client_id,
+            'response_type': 'code',
+            'redirect_uri': REDIRECT_URI,
+            'scope': ' '.join(scope),
+            'state': get_random_string(),
+        })
+    assert response.status_code == 302
+    code = parse_qs(urlparse(response['location']).query)['code'][0]
+
+    with query_budget('/openid/token/', scenario):
+        response = client.post('/openid/token/', {
+            'grant_type': 'authorization_code',
+            'code': code,
+            'redirect_uri': REDIRECT_URI,
+            'client_id': oidc_client.client_id,
+            'client_secret': oidc_client.client_secret,
+        })
+    assert response.status_code == 200
+    access_token = response.json()['access_token']
+
+    with query_budget('/openid/userinfo/', scenario):
+        response = client.get('/openid/userinfo/', HTTP_AUTHORIZATION='Bearer ' + access_token)
+    assert response.status_code == 200
+
+
+def get_callback_request():
+    request = RequestFactory().get('/accounts/helsinki_adfs/login/callback/')
+    request.user = AnonymousUser()
+    SessionMiddleware().process_request(request)
+    MessageMiddleware().process_request(request)
+    return request
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('ad_group_count', (0, 50))
+def test_social_login_callback_query_budget(query_budget, user_factory, socialaccount_factory,
+                                            socialapp_factory, ad_group_count):
+    socialapp = socialapp_factory(provider='helsinki_adfs')
+    account = socialaccount_factory(user=user_factory(), provider='helsinki_adfs')
+    extra_data = {'ad_groups': get_ad_group_names(ad_group_count)}
+
+    for state in ('changed', 'unchanged'):
+        request = get_callback_request()
+        login_account = SocialAccount(provider=account.provider, uid=account.uid, extra_data=extra_data)
+        sociallogin = SocialLogin(
+            account=login_account,
+            token=SocialToken(app=socialapp, account=login_account, token=get_random_string(),
+                              expires_at=timezone.now() + datetime.timedelta(hours=1)))
+        sociallogin.state = SocialLogin.state_from_request(request)
+
+        scenario = '{} AD groups, {}'.format(ad_group_count, state)
+        with query_budget('/accounts/helsinki_adfs/login/callback/', scenario):
+            response = complete_social_login(request, sociallogin)
+        assert response.status_code == 302
+        assert request.user == account.user
@@ -0,0 +1,132 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+import requests
+from allauth.socialaccount.providers.facebook import views as facebook_views
+from allauth.socialaccount.providers.github import views as github_views
+from allauth.socialaccount.providers.oauth2 import client as oauth2_client
+from allauth.socialaccount.providers.oauth2.client import OAuth2Error
+
+from tunnistamo import upstream
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.server.requests.append((self.path, self.client_address, self.rfile.read(length)))
+        if self.path == '/token':
+            self._respond(200, {'access_token': 'abc', 'token_type': 'bearer'})
+        else:
+            self._respond(400, {'error': 'invalid_grant'})
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.client_address, None))
+        self._respond(200, {'ok': True})
+
+    def _respond(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def stub_server():
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    upstream.close_sessions()
+    upstream.reset_upstream_stats()
+    yield server
+    upstream.uninstall_pooled_requests()
+    upstream.close_sessions()
+    server.shutdown()
+    server.server_close()
+
+
+def get_url(server, path):
+    return 'http://127.0.0.1:{}{}'.format(server.server_address[1], path)
+
+
+def test_connections_are_reused(stub_server):
+    upstream.get(get_url(stub_server, '/a'))
+    upstream.get(get_url(stub_server, '/b'))
+
+    (first, second) = stub_server.requests
+    assert first[1] == second[1]
+
+
+def test_latency_is_recorded(stub_server):
+    upstream.get(get_url(stub_server, '/a'))
+    upstream.post(get_url(stub_server, '/error'))
+
+    stats = upstream.get_upstream_stats()[get_url(stub_server, '')]
+    assert stats['requests'] == 2
+    assert stats['errors'] == 0
+    assert stats['total_time'] >= stats['max_time'] > 0
+
+
+def test_failed_connection_is_counted(settings, stub_server):
+    settings.UPSTREAM_HTTP_RETRIES = 0
+    url = get_url(stub_server, '/a')
+    stub_server.shutdown()
+    stub_server.server_close()
+
+    with pytest.raises(upstream.requests.ConnectionError):
+        upstream.get(url)
+
+    assert upstream.get_upstream_stats()[get_url(stub_server, '')]['errors'] == 1
+
+
+@pytest.mark.parametrize('path,succeeds', [('/token', True), ('/other', False)])
+def test_pooled_oauth2_client(stub_server, path, succeeds):
+    client = upstream.PooledOAuth2Client(
+        None, 'client-id', 'secret', 'POST', get_url(stub_server, path),
+        'http://localhost/callback/', ['openid'])
+
+    if succeeds:
+        assert client.get_access_token('the-code')['access_token'] == 'abc'
+    else:
+        with pytest.raises(OAuth2Error):
+            client.get_access_token('the-code')
+
+    body = stub_server.requests[0][2].decode('utf-8')
+    assert 'code=the-code' in body
+    assert 'client_secret=secret' in body
+    # The allauth client is left as is
+    assert oauth2_client.requests is requests
+
+
+def test_install_for_allauth_providers():
+    try:
+        upstream.install_for_allauth_providers(['github', 'nonexistent'])
+        pooled_requests = github_views.requests
+        assert pooled_requests is not requests
+        assert oauth2_client.requests is pooled_requests
+        assert facebook_views.requests is requests
+
+        # Installing again changes nothing
+        upstream.install_for_allauth_providers(['github'])
+        assert github_views.requests is pooled_requests
+        assert oauth2_client.requests is pooled_requests
+    finally:
+        upstream.uninstall_pooled_requests()
+
+    assert github_views.requests is requests
+    assert oauth2_client.requests is requests
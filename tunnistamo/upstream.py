@@ -0,0 +1,260 @@
+import importlib
+import logging
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from allauth.socialaccount.providers.oauth2.client import OAuth2Client, OAuth2Error
+from allauth.socialaccount.providers.oauth2.views import OAuth2CallbackView
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+LOG = logging.getLogger(__name__)
+
+OAUTH2_CLIENT_MODULE = 'allauth.socialaccount.providers.oauth2.client'
+ALLAUTH_PROVIDER_VIEWS_MODULE = 'allauth.socialaccount.providers.{}.views'
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_stats = defaultdict(lambda: {'requests': 0, 'errors': 0, 'total_time': 0.0, 'max_time': 0.0})
+_stats_lock = threading.Lock()
+_patched_modules = set()
+_patched_modules_lock = threading.Lock()
+
+
+def request(method, url, **kwargs):
+    """
+    Make an HTTP request to an upstream service.
+
+    Works like requests.request, but uses a pooled keep-alive session of
+    the upstream host, the configured default timeout and retries, and
+    records the latency of the request.
+
+    :type method: str
+    :type url: str
+    :rtype: requests.Response
+    """
+    host = _get_host(url)
+    kwargs.setdefault('timeout', settings.UPSTREAM_HTTP_TIMEOUT)
+    start = time.monotonic()
+    try:
+        response = get_session(host).request(method, url, **kwargs)
+    except requests.RequestException:
+        _record(host, time.monotonic() - start, error=True)
+        LOG.warning('Request to upstream %s failed', host, exc_info=True)
+        raise
+    _record(host, time.monotonic() - start, error=response.status_code >= 500)
+    return response
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def get_session(host):
+    """
+    Get the pooled session of an upstream host.
+
+    :type host: str
+    :param host: Scheme and network location, e.g. "https://fs.hel.fi"
+    :rtype: requests.Session
+    """
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _sessions[host] = _create_session()
+    return session
+
+
+def close_sessions():
+    """
+    Close the pooled sessions and their connections.
+    """
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+def get_upstream_stats():
+    """
+    Get the request counters and latencies of this process by the host.
+
+    :rtype: dict[str,dict]
+    """
+    with _stats_lock:
+        return {host: dict(stats) for (host, stats) in _stats.items()}
+
+
+def reset_upstream_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class PooledOAuth2Client(OAuth2Client):
+    """
+    OAuth2 client which makes the token requests with pooled sessions.
+
+    Builds the token request and handles its response like the allauth
+    client, but sends it with the pooled session of the upstream host.
+    """
+    def get_access_token(self, code):
+        data = {
+            'redirect_uri': self.callback_url,
+            'grant_type': 'authorization_code',
+            'code': code,
+        }
+        if self.basic_auth:
+            auth = requests.auth.HTTPBasicAuth(self.consumer_key, self.consumer_secret)
+        else:
+            auth = None
+            data.update({
+                'client_id': self.consumer_key,
+                'client_secret': self.consumer_secret,
+            })
+        params = None
+        self._strip_empty_keys(data)
+        if self.access_token_method == 'GET':
+            params = data
+            data = None
+        resp = request(self.access_token_method, self.access_token_url,
+                       params=params, data=data, headers=self.headers, auth=auth)
+        access_token = None
+        if resp.status_code == 200:
+            if (resp.headers['content-type'].split(';')[0] == 'application/json' or resp.text[:2] == '{"'):
+                access_token = resp.json()
+            else:
+                access_token = dict(parse_qsl(resp.text))
+        if not access_token or 'access_token' not in access_token:
+            raise OAuth2Error('Error retrieving access token: %s' % resp.content)
+        return access_token
+
+
+class PooledOAuth2CallbackView(OAuth2CallbackView):
+    """
+    OAuth2 callback view which uses the pooled OAuth2 client.
+    """
+    def get_client(self, request, app):
+        callback_url = self.adapter.get_callback_url(request, app)
+        provider = self.adapter.get_provider()
+        scope = provider.get_scope(request)
+        return PooledOAuth2Client(
+            self.request, app.client_id, app.secret,
+            self.adapter.access_token_method,
+            self.adapter.access_token_url,
+            callback_url, scope,
+            scope_delimiter=self.adapter.scope_delimiter,
+            headers=self.adapter.headers,
+            basic_auth=self.adapter.basic_auth)
+
+
+class _PooledRequestsModule(object):
+    """
+    Stand-in for the requests module which uses the pooled sessions.
+    """
+    request = staticmethod(request)
+    get = staticmethod(get)
+    post = staticmethod(post)
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+
+_pooled_requests = _PooledRequestsModule()
+
+
+def install_pooled_requests(module_name):
+    """
+    Make a module use the pooled sessions.
+
+    Replaces the requests module referenced by the module with the
+    pooled stand-in.  Installing more than once has no further effect.
+
+    :type module_name: str
+    :rtype: bool
+    :return: True if the module uses the pooled sessions
+    """
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError:
+        return False
+    with _patched_modules_lock:
+        if getattr(module, 'requests', None) is requests:
+            module.requests = _pooled_requests
+            _patched_modules.add(module_name)
+    return module_name in _patched_modules
+
+
+def uninstall_pooled_requests(module_name=None):
+    """
+    Restore the requests module of a patched module.
+
+    :type module_name: str|None
+    :param module_name: Module to restore, defaults to all patched modules
+    """
+    with _patched_modules_lock:
+        module_names = [module_name] if module_name else list(_patched_modules)
+        for name in module_names:
+            if name not in _patched_modules:
+                continue
+            module = importlib.import_module(name)
+            if getattr(module, 'requests', None) is _pooled_requests:
+                module.requests = requests
+            _patched_modules.discard(name)
+
+
+def install_for_allauth_providers(provider_ids):
+    """
+    Make stock allauth providers use the pooled sessions.
+
+    Patches the allauth OAuth2 client, which makes the token requests of
+    all OAuth2 providers, and the views of the given providers, which
+    fetch the user profiles.
+
+    :type provider_ids: Iterable[str]
+    :param provider_ids: Ids of the allauth providers, e.g. "github"
+    """
+    install_pooled_requests(OAUTH2_CLIENT_MODULE)
+    for provider_id in provider_ids:
+        install_pooled_requests(ALLAUTH_PROVIDER_VIEWS_MODULE.format(provider_id))
+
+
+def _create_session():
+    session = requests.Session()
+    retry = Retry(
+        total=settings.UPSTREAM_HTTP_RETRIES,
+        read=0,  # The requests may not be idempotent
+        backoff_factor=settings.UPSTREAM_HTTP_RETRY_BACKOFF,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.UPSTREAM_HTTP_POOL_SIZE,
+        max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _get_host(url):
+    parts = urlsplit(url)
+    return '{}://{}'.format(parts.scheme, parts.netloc)
+
+
+def _record(host, duration, error=False):
+    with _stats_lock:
+        stats = _stats[host]
+        stats['requests'] += 1
+        stats['total_time'] += duration
+        stats['max_time'] = max(stats['max_time'], duration)
+        if error:
+            stats['errors'] += 1
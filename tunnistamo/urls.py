@@ -6,9 +6,12 @@ from django.conf.urls import include, url
 from django.contrib import admin
 from django.contrib.staticfiles import views as static_views
 from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
 from django.views.defaults import permission_denied
+from oidc_provider import views as oidc_views
 
-from oidc_apis.views import get_api_tokens_view
+from oidc_apis.access_tokens import accept_jwt_access_tokens, issue_jwt_access_tokens
+from oidc_apis.views import get_api_tokens_view, introspect_tokens_view
 from users.views import EmailNeededView, LoginView, LogoutView
 
 from .api import GetJWTView, UserView
@@ -33,12 +36,15 @@ def show_login(request):
 urlpatterns = [
     url(r'^admin/', include(admin.site.urls)),
     url(r'^api-tokens/?$', get_api_tokens_view),
+    url(r'^introspect/?$', introspect_tokens_view),
     url(r'^accounts/profile/', show_login),
     url(r'^accounts/login/', LoginView.as_view()),
     url(r'^accounts/logout/', LogoutView.as_view()),
     url(r'^accounts/', include(allauth.urls)),
     url(r'^oauth2/applications/', permission_denied),
     url(r'^oauth2/', include(oauth2_provider.urls, namespace='oauth2_provider')),
+    url(r'^openid/token/?$', csrf_exempt(issue_jwt_access_tokens(oidc_views.TokenView.as_view()))),
+    url(r'^openid/userinfo/?$', csrf_exempt(accept_jwt_access_tokens(oidc_views.userinfo))),
     url(r'^openid/', include(oidc_provider.urls, namespace='oidc_provider')),
     url(r'^user/(?P<username>[\w.@+-]+)/?$', UserView.as_view()),
     url(r'^user/$', UserView.as_view()),
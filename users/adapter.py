@@ -1,21 +1,26 @@
 import uuid
+from collections import defaultdict
 from urllib.parse import urlencode
 
 from allauth.account.models import EmailAddress
 from allauth.account.utils import user_email
 from allauth.exceptions import ImmediateHttpResponse
-from allauth.socialaccount import app_settings
 from allauth.socialaccount.adapter import DefaultSocialAccountAdapter
 from allauth.socialaccount.signals import social_account_added, social_account_updated
-from allauth.utils import email_address_exists
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, CharField, Value, When
+from django.db.models.functions import Lower
 from django.dispatch import receiver
 from django.shortcuts import redirect
 from django.urls import reverse
 
 from adfs_provider.provider import ADFSProvider
 
-from .models import LoginMethod
+from .cache import invalidate_user
+from .models import LoginMethod, normalize_email
+from .providers import get_provider_policy
+from .userinfo import refresh_userinfo_snapshot_by_id
 
 
 class SocialAccountAdapter(DefaultSocialAccountAdapter):
@@ -29,15 +34,13 @@ class SocialAccountAdapter(DefaultSocialAccountAdapter):
         :type request: django.http.HttpRequest
         :type sociallogin: allauth.socialaccount.models.SocialLogin
         """
-        if sociallogin.account.provider == 'helsinki_adfs':
-            if not sociallogin.is_existing:
-                link_old_helsinki_saml_users(request, sociallogin)
-        elif sociallogin.account.provider == 'facebook':
-            if not sociallogin.email_addresses:
-                handle_facebook_without_email(sociallogin)
+        policy = get_provider_policy(sociallogin.account.provider)
+        if policy.new_login_handler and not sociallogin.is_existing:
+            policy.new_login_handler(request, sociallogin)
+        if policy.missing_email_handler and not sociallogin.email_addresses:
+            policy.missing_email_handler(request, sociallogin)
 
-        trusted_providers = get_trusted_providers()
-        if sociallogin.account.provider in trusted_providers:
+        if policy.trusted:
             if not sociallogin.is_existing:
                 link_by_trusted_email(request, sociallogin)
 
@@ -47,11 +50,9 @@ class SocialAccountAdapter(DefaultSocialAccountAdapter):
     def populate_user(self, request, sociallogin, data):
         user = super().populate_user(request, sociallogin, data)
 
-        provider = sociallogin.account.get_provider()
-        if provider.id == 'helsinki_adfs':
-            user.primary_sid = data.get('primary_sid')
-            user.department_name = data.get('department_name')
-            user.uuid = uuid.uuid5(provider.domain_uuid, user.primary_sid).hex
+        policy = get_provider_policy(sociallogin.account.provider)
+        if policy.attribute_cleaner:
+            policy.attribute_cleaner(user, sociallogin, data)
 
         if callable(getattr(user, 'set_username_from_uuid', None)):
             user.set_username_from_uuid()
@@ -66,8 +67,8 @@ class SocialAccountAdapter(DefaultSocialAccountAdapter):
         return username.lower()
 
     def is_auto_signup_allowed(self, request, sociallogin):
-        # Always trust ADFS logins
-        if sociallogin.account.provider == 'helsinki_adfs':
+        # Always trust the providers with auto signup policy, e.g. ADFS
+        if get_provider_policy(sociallogin.account.provider).auto_signup:
             return True
         # Parent checks if email is new or reserved
         parent = super(SocialAccountAdapter, self)
@@ -80,7 +81,7 @@ class SocialAccountAdapter(DefaultSocialAccountAdapter):
         if email_address_exists(email):
             User = get_user_model()
             try:
-                user = User.objects.get(email__iexact=email)
+                user = User.objects.get(normalized_email=normalize_email(email))
                 social_set = user.socialaccount_set.all()
                 # If the account doesn't have any social logins yet,
                 # allow the signup.
@@ -115,7 +116,21 @@ def link_old_helsinki_saml_users(request, sociallogin):
         sociallogin.connect(request, user)
 
 
-def handle_facebook_without_email(sociallogin):
+def clean_helsinki_adfs_attributes(user, sociallogin, data):
+    """
+    Fill in the Helsinki ADFS specific attributes of the user.
+
+    :type user: users.models.User
+    :type sociallogin: allauth.socialaccount.models.SocialLogin
+    :type data: dict
+    """
+    provider = sociallogin.account.get_provider()
+    user.primary_sid = data.get('primary_sid')
+    user.department_name = data.get('department_name')
+    user.uuid = uuid.uuid5(provider.domain_uuid, user.primary_sid).hex
+
+
+def handle_facebook_without_email(request, sociallogin):
     if 'rerequest' not in sociallogin.state['auth_params']:
         login_uri = reverse('facebook_login')
 
@@ -139,48 +154,137 @@ def link_by_trusted_email(request, sociallogin):
     """
     Link social login to existing User by trusted email address.
 
+    The social login is connected to a user who has verified some of the
+    login's verified email addresses.  Of several such users, the one
+    with the last address of the last matching email is chosen, as when
+    the users were connected one by one.  Unverified copies of
+    those addresses are removed from their users.  All the addresses
+    involved are fetched in a single query and the changes are applied
+    in a single transaction.
+
     :type request: django.http.HttpRequest
     :type sociallogin: allauth.socialaccount.models.SocialLogin
     """
     assert not sociallogin.is_existing, "Not yet linked to user"
+    emails = []
     for email_address in sociallogin.email_addresses:
-        if email_address.verified:
-            email = email_address.email
-            # Note: get_users_for finds only verified email addresses
-            users = EmailAddress.objects.get_users_for(email=email)
-            for user in users:
-                sociallogin.connect(request, user)
-            unverified_emails = EmailAddress.objects.filter(
-                email__iexact=email, verified=False)
-            for unverified_email in unverified_emails:
-                remove_email(unverified_email)
-
-
-def remove_email(email_obj):
+        email = normalize_email(email_address.email)
+        if email_address.verified and email and email not in emails:
+            emails.append(email)
+    if not emails:
+        return
+
+    # Fetch all addresses of the users having some of the emails, so
+    # that replacement primary emails can be picked without querying
+    matching = filter_email_addresses(emails)
+    addresses = list(
+        EmailAddress.objects.filter(user__in=matching.values('user'))
+        .select_related('user').order_by('pk'))
+    (user_to_connect, addresses_to_delete, emails_to_update) = _resolve_trusted_email_links(emails, addresses)
+
+    with transaction.atomic():
+        if emails_to_update:
+            _update_user_emails(emails_to_update, user_to_connect)
+        if addresses_to_delete:
+            EmailAddress.objects.filter(pk__in=[address.pk for address in addresses_to_delete]).delete()
+        if user_to_connect:
+            sociallogin.connect(request, user_to_connect)
+
+
+def _resolve_trusted_email_links(emails, addresses):
+    users = {}
+    addresses_by_user = defaultdict(list)
+    for address in addresses:
+        users.setdefault(address.user_id, address.user)
+        addresses_by_user[address.user_id].append(address)
+
+    # Note: Only verified addresses are trusted to identify the user
+    verified = [
+        address for address in addresses
+        if address.verified and normalize_email(address.email) in emails
+    ]
+    # Of several matching users, connect the one that connecting them in
+    # turn, in the order of the emails and then of the addresses, would
+    # leave connected, i.e. the last one
+    verified.sort(key=lambda address: (emails.index(normalize_email(address.email)), address.pk))
+    user_to_connect = users[verified[-1].user_id] if verified else None
+
+    addresses_to_delete = [
+        address for address in addresses
+        if not address.verified and normalize_email(address.email) in emails
+    ]
+    deleted_emails_by_user = defaultdict(set)
+    for address in addresses_to_delete:
+        deleted_emails_by_user[address.user_id].add(normalize_email(address.email))
+
+    # Replace the primary email of the users losing it with some of
+    # their remaining addresses
+    emails_to_update = {}
+    for (user_id, deleted_emails) in deleted_emails_by_user.items():
+        user = users[user_id]
+        if normalize_email(user.email) not in deleted_emails:
+            continue
+        remaining = [
+            address.email for address in addresses_by_user[user_id]
+            if normalize_email(address.email) not in deleted_emails
+        ]
+        emails_to_update[user_id] = remaining[0] if remaining else ''
+    return (user_to_connect, addresses_to_delete, emails_to_update)
+
+
+def _update_user_emails(emails_to_update, user_to_connect):
+    if user_to_connect and user_to_connect.pk in emails_to_update:
+        # The user is saved when the social login is connected
+        user_to_connect.email = emails_to_update.pop(user_to_connect.pk)
+    if not emails_to_update:
+        return
+    email_cases = [When(pk=user_id, then=Value(email)) for (user_id, email) in emails_to_update.items()]
+    normalized_cases = [
+        When(pk=user_id, then=Value(normalize_email(email))) for (user_id, email) in emails_to_update.items()]
+    user_ids = list(emails_to_update)
+    get_user_model().objects.filter(pk__in=user_ids).update(
+        email=Case(*email_cases, output_field=CharField()),
+        normalized_email=Case(*normalized_cases, output_field=CharField()))
+
+    # The update doesn't send the save signals of the users
+    for user_id in user_ids:
+        invalidate_user(user_id)
+    transaction.on_commit(lambda: _refresh_userinfo_snapshots(user_ids))
+
+
+def _refresh_userinfo_snapshots(user_ids):
+    for user_id in user_ids:
+        refresh_userinfo_snapshot_by_id(user_id)
+
+
+def filter_email_addresses(emails):
     """
-    Remove email address and clean it from the user.
+    Get the email addresses matching some of given normalized emails.
+
+    The addresses are matched by LOWER(email), which has an index unlike
+    the UPPER(email) of the iexact lookup.
 
-    :type email_obj: EmailAddress
+    :type emails: list[str]
+    :rtype: django.db.models.QuerySet
     """
-    email = email_obj.email
-    user = email_obj.user
-    if user.email and user.email.lower() == email.lower():
-        other_emails = EmailAddress.objects.filter(
-            user=user).exclude(email__iexact=email)
-        if other_emails:
-            user.email = other_emails.first().email
-        else:
-            user.email = ''
-        user.save()
-    email_obj.delete()
+    return EmailAddress.objects.annotate(normalized_email=Lower('email')).filter(normalized_email__in=emails)
+
 
+def email_address_exists(email):
+    """
+    Check if the email address is in use by some user.
 
-def get_trusted_providers():
-    trusted_providers = set()
-    for provider_name, provider_settings in app_settings.PROVIDERS.items():
-        if provider_settings.get('TRUSTED', False):
-            trusted_providers.add(provider_name)
-    return trusted_providers
+    Like allauth.utils.email_address_exists, but looks up the users by
+    the indexed normalized email instead of a case insensitive match.
+
+    :type email: str
+    :rtype: bool
+    """
+    if not email:
+        return False
+    if filter_email_addresses([normalize_email(email)]).exists():
+        return True
+    return get_user_model().objects.filter(normalized_email=normalize_email(email)).exists()
 
 
 def update_ad_groups(account):
@@ -1,4 +1,6 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core import checks
 from django.utils.translation import ugettext_lazy as _
 
 
@@ -9,3 +11,13 @@ class UsersConfig(AppConfig):
     def ready(self):
         # Register signal handlers
         from . import signals  # noqa
+
+        from tunnistamo.cache import check_shared_cache
+        checks.register(check_shared_cache, checks.Tags.caches)
+
+        from .providers import load_provider_policies
+        load_provider_policies()
+
+        if settings.UPSTREAM_HTTP_POOL_ALLAUTH_PROVIDERS:
+            from tunnistamo.upstream import install_for_allauth_providers
+            install_for_allauth_providers(settings.UPSTREAM_HTTP_POOL_ALLAUTH_PROVIDERS)
@@ -0,0 +1,136 @@
+import hashlib
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.utils import timezone
+from oauth2_provider.contrib.rest_framework import OAuth2Authentication
+
+from tunnistamo.cache import LRUCache, get_cache
+
+from .cache import get_user_version
+
+
+class CachedOAuth2Authentication(OAuth2Authentication):
+    """
+    OAuth 2 authentication which caches the validated access tokens.
+
+    Validated tokens are kept in a small process local LRU cache and in
+    the shared cache, so that repeated requests with the same token
+    don't need the AccessToken, Application and User queries.  A cached
+    token is dropped when it expires, when it's revoked or changed, or
+    when the data of its user changes.
+    """
+    def authenticate(self, request):
+        token = _get_bearer_token(request)
+        if not token:
+            return super(CachedOAuth2Authentication, self).authenticate(
+                request)
+
+        access_token = get_cached_access_token(token)
+        if access_token:
+            return (access_token.user, access_token)
+
+        result = super(CachedOAuth2Authentication, self).authenticate(request)
+        if result:
+            cache_access_token(result[1])
+        return result
+
+
+_local_cache = LRUCache(settings.TOKEN_AUTH_CACHE_SIZE)
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cached_access_token(token):
+    """
+    Get a validated access token from the caches.
+
+    :type token: str
+    :rtype: oauth2_provider.models.AccessToken|None
+    """
+    key = _get_cache_key(token)
+    entry = _local_cache.get(key)
+    source = 'local_hits'
+    if entry is None:
+        entry = get_cache().get(key)
+        source = 'shared_hits'
+    if entry is not None:
+        (user_version, access_token) = entry
+        if (not access_token.is_expired() and
+                user_version == get_user_version(access_token.user_id)):
+            if source == 'shared_hits':
+                _local_cache.set(key, entry, _get_timeout(
+                    access_token, settings.TOKEN_AUTH_CACHE_LOCAL_TIMEOUT))
+            _count(source)
+            return access_token
+        evict_access_token(token)
+    _count('misses')
+    return None
+
+
+def cache_access_token(access_token):
+    """
+    Cache a validated access token.
+
+    :type access_token: oauth2_provider.models.AccessToken
+    """
+    key = _get_cache_key(access_token.token)
+    entry = (get_user_version(access_token.user_id), access_token)
+    timeout = _get_timeout(access_token, settings.TOKEN_AUTH_CACHE_TIMEOUT)
+    if timeout <= 0:
+        return
+    get_cache().set(key, entry, timeout=timeout)
+    _local_cache.set(key, entry, _get_timeout(
+        access_token, settings.TOKEN_AUTH_CACHE_LOCAL_TIMEOUT))
+
+
+def evict_access_token(token):
+    """
+    Remove an access token from the caches.
+
+    :type token: str
+    """
+    key = _get_cache_key(token)
+    _local_cache.delete(key)
+    get_cache().delete(key)
+
+
+def get_cache_stats():
+    """
+    Get the hit and miss counters of this process.
+
+    :rtype: dict[str,int]
+    """
+    with _stats_lock:
+        return {
+            name: _stats[name]
+            for name in ['local_hits', 'shared_hits', 'misses']
+        }
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _get_bearer_token(request):
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(auth_header) == 2 and auth_header[0].lower() == 'bearer':
+        return auth_header[1]
+    return None
+
+
+def _get_timeout(access_token, max_timeout):
+    remaining = (access_token.expires - timezone.now()).total_seconds()
+    return min(int(remaining), max_timeout)
+
+
+def _get_cache_key(token):
+    token_hash = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    return 'users:access_token:{}'.format(token_hash)
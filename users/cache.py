@@ -0,0 +1,28 @@
+from tunnistamo.cache import bump_version, get_version
+
+
+def get_user_version(user_id):
+    """
+    Get the version of the data of given user.
+
+    The version changes whenever the user, their email addresses,
+    social accounts or AD groups change.  It can be used as a part of a
+    cache key for caching data derived from the user.
+
+    :type user_id: int
+    :rtype: int
+    """
+    return get_version(_get_user_version_name(user_id))
+
+
+def invalidate_user(user_id):
+    """
+    Invalidate the cached data derived from given user.
+
+    :type user_id: int
+    """
+    bump_version(_get_user_version_name(user_id))
+
+
+def _get_user_version_name(user_id):
+    return 'users.user:{}'.format(user_id)
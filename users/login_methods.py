@@ -0,0 +1,119 @@
+import hashlib
+
+from allauth.socialaccount import providers
+from django.conf import settings
+from oauth2_provider.models import get_application_model
+from oidc_provider.models import Client
+
+from tunnistamo.cache import VersionedValue, bump_version, get_cache, get_version
+
+from .models import LoginMethod, OidcClientOptions
+
+LOGIN_METHODS_VERSION = 'users.login_methods'
+
+
+def get_login_methods(client_id, request):
+    """
+    Get the login methods available for a client.
+
+    The login method table of each client is built once and then served
+    from the cache until the login methods or the client options change.
+
+    :type client_id: str|None
+    :param client_id:
+      Client id of an OAuth2 application or an OIDC client, if known
+    :type request: django.http.HttpRequest
+    :rtype: list[LoginMethod]
+    :return:
+      Ordered login methods with their base login URL in the
+      `login_url` attribute
+    """
+    client_id = get_login_methods_client_id(client_id)
+    cache = get_cache()
+    key = _get_cache_key(client_id)
+    login_methods = cache.get(key)
+    if login_methods is None:
+        login_methods = build_login_methods(client_id, request)
+        cache.set(key, login_methods, timeout=settings.LOGIN_METHODS_CACHE_TIMEOUT)
+    return login_methods
+
+
+def get_login_methods_client_id(client_id):
+    """
+    Get the client id to look up the login methods of a client by.
+
+    Only the OAuth2 applications and the OIDC clients with options have
+    login methods of their own.  Other client ids, including unknown
+    ones, get the default login methods and map to None, so that they
+    can't fill the caches with entries of their own.
+
+    :type client_id: str|None
+    :rtype: str|None
+    """
+    if client_id and client_id in _clients_with_login_methods.get():
+        return client_id
+    return None
+
+
+def _load_clients_with_login_methods():
+    return frozenset(get_application_model().objects.values_list('client_id', flat=True)) | frozenset(
+        OidcClientOptions.objects.values_list('oidc_client__client_id', flat=True))
+
+
+# The version is bumped on every change of the applications and the OIDC
+# client options, see users.signals
+_clients_with_login_methods = VersionedValue(LOGIN_METHODS_VERSION, _load_clients_with_login_methods)
+
+
+def build_login_methods(client_id, request):
+    """
+    Build the login method table of a client from the database.
+
+    :type client_id: str|None
+    :type request: django.http.HttpRequest
+    :rtype: list[LoginMethod]
+    """
+    allowed_methods = None
+    if client_id:
+        app = get_application_model().objects.filter(
+            client_id=client_id).first()
+        if app:
+            allowed_methods = app.login_methods.all()
+        else:
+            client_options = OidcClientOptions.objects.filter(
+                oidc_client__in=Client.objects.filter(client_id=client_id)
+            ).first()
+            if client_options:
+                allowed_methods = client_options.login_methods.all()
+
+    if allowed_methods is None:
+        allowed_methods = LoginMethod.objects.all()
+
+    provider_map = providers.registry.provider_map
+    methods = []
+    for m in allowed_methods:
+        assert isinstance(m, LoginMethod)
+        if m.provider_id == 'saml':
+            continue  # SAML support removed
+        try:
+            provider_cls = provider_map[m.provider_id]
+        except KeyError:
+            continue
+        provider = provider_cls(request)
+        m.login_url = provider.get_login_url(request=request)
+        methods.append(m)
+    return methods
+
+
+def invalidate_login_methods():
+    """
+    Invalidate the cached login method tables of all clients.
+    """
+    bump_version(LOGIN_METHODS_VERSION)
+
+
+def _get_cache_key(client_id):
+    client_hash = hashlib.sha256((client_id or '').encode('utf-8'))
+    return 'users:login_methods:{version}:{client}'.format(
+        version=get_version(LOGIN_METHODS_VERSION),
+        client=client_hash.hexdigest())
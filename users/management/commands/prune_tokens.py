@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.token_pruning import get_prune_targets, prune_in_batches
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired tokens, codes, grants, consents and sessions "
+        "in small batches.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Number of rows to delete per batch (default: 1000)")
+        parser.add_argument(
+            '--sleep', type=float, default=0.1,
+            help="Seconds to sleep between the batches (default: 0.1)")
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only count the rows that would be deleted")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError("Batch size must be positive")
+        verb = "Would prune" if options['dry_run'] else "Pruned"
+
+        total = 0
+        total_start = time.monotonic()
+        for target in get_prune_targets():
+            count = 0
+            start = time.monotonic()
+            for batch_count in prune_in_batches(
+                    target.queryset, batch_size=batch_size,
+                    sleep=options['sleep'], dry_run=options['dry_run']):
+                count += batch_count
+            elapsed = time.monotonic() - start
+            self.stdout.write("{} {} {} rows in {:.2f} s ({:.0f} rows/s)".format(
+                verb, count, target.name, elapsed, count / elapsed if elapsed else 0))
+            total += count
+
+        elapsed = time.monotonic() - total_start
+        self.stdout.write("{} {} rows in total in {:.2f} s ({:.0f} rows/s)".format(
+            verb, total, elapsed, total / elapsed if elapsed else 0))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from users.userinfo import rebuild_userinfo_snapshots
+
+
+class Command(BaseCommand):
+    help = "Rebuild the cached userinfo claims snapshots of all users."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help="Number of users to process per batch (default: 500)")
+
+    def handle(self, *args, **options):
+        count = rebuild_userinfo_snapshots(batch_size=options['batch_size'])
+        self.stdout.write("Rebuilt {} userinfo snapshots".format(count))
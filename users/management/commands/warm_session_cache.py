@@ -0,0 +1,34 @@
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.session_store import SessionStore
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the active sessions from the database to the session cache. "
+        "Run after switching SESSION_ENGINE to users.session_store.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help="Number of sessions to process per batch (default: 500)")
+
+    def handle(self, *args, **options):
+        queryset = Session.objects.filter(
+            expire_date__gt=timezone.now()).order_by('session_key')
+        count = 0
+        last_key = None
+        while True:
+            batch_queryset = queryset
+            if last_key is not None:
+                batch_queryset = batch_queryset.filter(session_key__gt=last_key)
+            sessions = list(batch_queryset[:options['batch_size']])
+            if not sessions:
+                break
+            for session in sessions:
+                SessionStore().cache_from_db(session)
+            count += len(sessions)
+            last_key = sessions[-1].session_key
+        self.stdout.write("Cached {} sessions".format(count))
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_create_model_oidc_client_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='oidcclientoptions',
+            name='jwt_access_tokens',
+            field=models.BooleanField(
+                default=False, help_text='Issue signed JWTs instead of opaque strings as access tokens',
+                verbose_name='JWT access tokens'),
+        ),
+    ]
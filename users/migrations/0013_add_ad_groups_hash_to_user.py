@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_add_jwt_access_tokens_to_oidc_client_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='ad_groups_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
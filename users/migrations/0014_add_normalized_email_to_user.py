@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models, transaction
+from django.db.models import Case, CharField, Value, When
+
+BATCH_SIZE = 1000
+
+USER_INDEX = 'users_user_normalized_email_idx'
+EMAIL_ADDRESS_INDEX = 'account_emailaddress_lower_email'
+
+
+def normalize_email(email):
+    # Same as users.models.normalize_email at the time of this migration
+    return (email or '').lower()
+
+
+def backfill_normalized_email(apps, schema_editor):
+    User = apps.get_model('users', 'User')  # noqa
+    users = User.objects.using(schema_editor.connection.alias).order_by('pk')
+    last_pk = None
+    while True:
+        batch = users if last_pk is None else users.filter(pk__gt=last_pk)
+        rows = list(batch.values_list('pk', 'email')[:BATCH_SIZE])
+        if not rows:
+            break
+        cases = [When(pk=pk, then=Value(normalize_email(email))) for (pk, email) in rows]
+        with transaction.atomic(using=schema_editor.connection.alias):
+            users.filter(pk__in=[pk for (pk, email) in rows]).update(
+                normalized_email=Case(*cases, output_field=CharField()))
+        last_pk = rows[-1][0]
+
+
+def create_indexes(apps, schema_editor):
+    # Build the indexes without locking the tables for writes where the
+    # database supports it
+    concurrently = 'CONCURRENTLY ' if schema_editor.connection.vendor == 'postgresql' else ''
+    schema_editor.execute('CREATE INDEX {}{} ON users_user (normalized_email)'.format(
+        concurrently, USER_INDEX))
+    # The email addresses are looked up by LOWER(email), see
+    # users.adapter.filter_email_addresses
+    schema_editor.execute('CREATE INDEX {}{} ON account_emailaddress (LOWER(email))'.format(
+        concurrently, EMAIL_ADDRESS_INDEX))
+
+
+def drop_indexes(apps, schema_editor):
+    concurrently = 'CONCURRENTLY ' if schema_editor.connection.vendor == 'postgresql' else ''
+    for index in (USER_INDEX, EMAIL_ADDRESS_INDEX):
+        schema_editor.execute('DROP INDEX {}{}'.format(concurrently, index))
+
+
+class Migration(migrations.Migration):
+    # Commit the backfill in batches and build the indexes concurrently
+    atomic = False
+
+    dependencies = [
+        ('account', '0002_email_max_length'),
+        ('users', '0013_add_ad_groups_hash_to_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='normalized_email',
+            field=models.CharField(blank=True, default='', editable=False, max_length=254),
+        ),
+        migrations.RunPython(backfill_normalized_email, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_indexes, drop_indexes),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='user',
+                    name='normalized_email',
+                    field=models.CharField(
+                        blank=True, db_index=True, default='', editable=False, max_length=254),
+                ),
+            ],
+        ),
+    ]
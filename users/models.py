@@ -1,24 +1,122 @@
 from __future__ import unicode_literals
 
+import hashlib
 import uuid
 
 from allauth.socialaccount import providers
-from django.db import models
+from django.db import models, transaction
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _
-from helusers.models import AbstractUser
+from helusers.models import AbstractUser, ADGroup, ADGroupMapping
 from oauth2_provider.models import AbstractApplication
 from oidc_provider.models import Client
 
 
 class User(AbstractUser):
     primary_sid = models.CharField(max_length=100, unique=True)
+    ad_groups_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    normalized_email = models.CharField(max_length=254, blank=True, default='', editable=False, db_index=True)
 
     def save(self, *args, **kwargs):
         if not self.primary_sid:
             self.primary_sid = uuid.uuid4()
+        self.normalized_email = normalize_email(self.email)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'email' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'normalized_email'}
         return super(User, self).save(*args, **kwargs)
 
+    def update_ad_groups(self, ad_group_names):
+        """
+        Synchronize the AD groups of the user with given group names.
+
+        Nothing is done if the group list is the same as in the previous
+        synchronization.  Otherwise the missing ADGroup objects are
+        created and only the changed memberships are added or removed,
+        each in a single query.
+
+        :type ad_group_names: list[str]
+        """
+        # AD group names are case insensitive, the first spelling of
+        # each name is used as its display name
+        display_names = {}
+        for name in ad_group_names:
+            display_names.setdefault(name.lower(), name)
+        ad_groups_hash = _hash_ad_group_names(display_names)
+        if ad_groups_hash == self.ad_groups_hash:
+            return
+
+        with transaction.atomic():
+            # Lock the User object to prevent races
+            user = type(self).objects.select_for_update().only('ad_groups_hash').get(id=self.id)
+            if ad_groups_hash != user.ad_groups_hash:
+                self._sync_ad_groups(user, display_names)
+                type(self).objects.filter(id=self.id).update(ad_groups_hash=ad_groups_hash)
+        self.ad_groups_hash = ad_groups_hash
+
+    def _sync_ad_groups(self, user, display_names):
+        ad_group_ids = dict(ADGroup.objects.filter(name__in=display_names).values_list('name', 'id'))
+        missing = [
+            ADGroup(name=name, display_name=display_name)
+            for (name, display_name) in display_names.items()
+            if name not in ad_group_ids
+        ]
+        if missing:
+            ADGroup.objects.bulk_create(missing)
+            created = ADGroup.objects.filter(name__in=[ad_group.name for ad_group in missing])
+            ad_group_ids.update(created.values_list('name', 'id'))
+
+        new_ad_groups = set(ad_group_ids.values())
+        old_ad_groups = set(user.ad_groups.values_list('id', flat=True))
+        groups_to_add = new_ad_groups - old_ad_groups
+        if groups_to_add:
+            user.ad_groups.add(*groups_to_add)
+        groups_to_remove = old_ad_groups - new_ad_groups
+        if groups_to_remove:
+            user.ad_groups.remove(*groups_to_remove)
+
+        user.sync_groups_from_ad(new_ad_groups)
+
+    def sync_groups_from_ad(self, ad_group_ids=None):
+        """
+        Determine which Django groups to add or remove based on AD groups.
+
+        :type ad_group_ids: set[int]|None
+        :param ad_group_ids:
+          IDs of the AD groups of the user, if already known
+        """
+        if ad_group_ids is None:
+            ad_group_ids = set(self.ad_groups.values_list('id', flat=True))
+        mappings = list(ADGroupMapping.objects.values_list('ad_group', 'group'))
+        all_mapped_groups = set(group for (ad_group, group) in mappings)
+        new_groups = set(group for (ad_group, group) in mappings if ad_group in ad_group_ids)
+        old_groups = set(self.groups.filter(id__in=all_mapped_groups).values_list('id', flat=True))
+
+        groups_to_delete = old_groups - new_groups
+        if groups_to_delete:
+            self.groups.remove(*groups_to_delete)
+        groups_to_add = new_groups - old_groups
+        if groups_to_add:
+            self.groups.add(*groups_to_add)
+
+
+def normalize_email(email):
+    """
+    Normalize email address for case insensitive lookups.
+
+    Users should be looked up by the normalized email with an exact
+    match, since that can use an index unlike the iexact lookup.
+
+    :type email: str|None
+    :rtype: str
+    """
+    return (email or '').lower()
+
+
+def _hash_ad_group_names(display_names):
+    value = '\n'.join(sorted(display_names))
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
 
 def get_login_methods():
     yield ('saml', 'SAML')
@@ -68,6 +166,9 @@ class Application(OptionsBase, AbstractApplication):
 class OidcClientOptions(OptionsBase):
     oidc_client = models.OneToOneField(Client, related_name='+', on_delete=models.CASCADE,
                                        verbose_name=_("OIDC Client"))
+    jwt_access_tokens = models.BooleanField(
+        default=False, verbose_name=_("JWT access tokens"),
+        help_text=_("Issue signed JWTs instead of opaque strings as access tokens"))
 
     def __str__(self):
         return 'Options for OIDC Client "{}"'.format(self.oidc_client.name)
@@ -0,0 +1,85 @@
+from collections import namedtuple
+
+from allauth.socialaccount import app_settings
+from django.utils.module_loading import import_string
+
+ProviderPolicy = namedtuple('ProviderPolicy', [
+    'trusted',
+    'auto_signup',
+    'new_login_handler',
+    'missing_email_handler',
+    'attribute_cleaner',
+])
+ProviderPolicy.__doc__ = """
+Policy of a social login provider.
+
+:ivar trusted:
+  Whether the email addresses of the provider are trusted enough to
+  link new social logins to existing users
+:ivar auto_signup:
+  Whether the users of the provider are always signed up
+  automatically
+:ivar new_login_handler:
+  Callable which gets the request and the social login of a social
+  account not yet linked to any user, or None
+:ivar missing_email_handler:
+  Callable which gets the request and the social login if the
+  provider didn't return any email addresses, or None
+:ivar attribute_cleaner:
+  Callable which gets the user, the social login and the provider
+  data to fill in the provider specific user attributes, or None
+"""
+
+DEFAULT_POLICY = ProviderPolicy(
+    trusted=False,
+    auto_signup=False,
+    new_login_handler=None,
+    missing_email_handler=None,
+    attribute_cleaner=None,
+)
+
+PROVIDER_POLICIES = {
+    'helsinki_adfs': {
+        'auto_signup': True,
+        'new_login_handler': 'users.adapter.link_old_helsinki_saml_users',
+        'attribute_cleaner': 'users.adapter.clean_helsinki_adfs_attributes',
+    },
+    'facebook': {
+        'missing_email_handler': 'users.adapter.handle_facebook_without_email',
+    },
+}
+
+_policies = None
+
+
+def get_provider_policy(provider_id):
+    """
+    Get the policy of a social login provider.
+
+    :type provider_id: str|None
+    :rtype: ProviderPolicy
+    """
+    if _policies is None:
+        load_provider_policies()
+    return _policies.get(provider_id, DEFAULT_POLICY)
+
+
+def load_provider_policies():
+    """
+    Build the policies of the social login providers.
+
+    The policies are built once when the app is ready and rebuilt when
+    the SOCIALACCOUNT_PROVIDERS setting changes.
+    """
+    global _policies
+    policies = {}
+    provider_ids = set(PROVIDER_POLICIES) | set(app_settings.PROVIDERS)
+    for provider_id in provider_ids:
+        options = dict(PROVIDER_POLICIES.get(provider_id, {}))
+        for (field, value) in options.items():
+            if field.endswith(('_handler', '_cleaner')):
+                options[field] = import_string(value)
+        provider_settings = app_settings.PROVIDERS.get(provider_id, {})
+        options['trusted'] = provider_settings.get('TRUSTED', False)
+        policies[provider_id] = DEFAULT_POLICY._replace(**options)
+    _policies = policies
@@ -0,0 +1,207 @@
+"""
+Cached, database backed session engine with lazily loaded keys.
+
+Use by setting SESSION_ENGINE to "users.session_store".  The sessions
+are written to both the database and the session cache, and read from
+the cache whenever possible.  Sessions already in the database, e.g.
+ones created with the default database engine, are read from the
+database and cached on first use, so the engine can be switched without
+logging anyone out.
+
+The keys listed in SESSION_LAZY_KEYS (e.g. "login_methods") are cached
+separately from the rest of the session and loaded only when accessed.
+"""
+import logging
+from functools import partial
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.core.exceptions import SuspiciousOperation
+from django.utils import timezone
+from django.utils.encoding import force_text
+
+LAZY_KEY_SUFFIX = ':lazy'
+
+
+class LazySessionData(dict):
+    """
+    Session data dictionary which loads the lazy keys on first access.
+    """
+    def __init__(self, data, lazy_keys, loader):
+        """
+        :type data: dict
+        :type lazy_keys: Iterable[str]
+        :type loader: Callable[[], dict]
+        :param loader: Function for loading the values of the lazy keys
+        """
+        super(LazySessionData, self).__init__(data)
+        self.lazy_keys = frozenset(lazy_keys)
+        self._loader = loader
+
+    @property
+    def is_loaded(self):
+        return self._loader is None
+
+    def load_all(self):
+        """
+        Load the values of the lazy keys.
+        """
+        if self._loader is None:
+            return
+        (loader, self._loader) = (self._loader, None)
+        for (key, value) in loader().items():
+            if key in self.lazy_keys:
+                super(LazySessionData, self).setdefault(key, value)
+
+    def _load_for(self, key):
+        if key in self.lazy_keys:
+            self.load_all()
+
+    def __getitem__(self, key):
+        self._load_for(key)
+        return super(LazySessionData, self).__getitem__(key)
+
+    def __setitem__(self, key, value):
+        self._load_for(key)
+        super(LazySessionData, self).__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._load_for(key)
+        super(LazySessionData, self).__delitem__(key)
+
+    def __contains__(self, key):
+        self._load_for(key)
+        return super(LazySessionData, self).__contains__(key)
+
+    def get(self, key, default=None):
+        self._load_for(key)
+        return super(LazySessionData, self).get(key, default)
+
+    def pop(self, key, *args):
+        self._load_for(key)
+        return super(LazySessionData, self).pop(key, *args)
+
+    def setdefault(self, key, default=None):
+        self._load_for(key)
+        return super(LazySessionData, self).setdefault(key, default)
+
+    def __bool__(self):
+        # Don't load just for checking if the session is empty
+        return self._loader is not None or super(LazySessionData, self).__len__() > 0
+
+    def __iter__(self):
+        self.load_all()
+        return super(LazySessionData, self).__iter__()
+
+    def __len__(self):
+        self.load_all()
+        return super(LazySessionData, self).__len__()
+
+    def keys(self):
+        self.load_all()
+        return super(LazySessionData, self).keys()
+
+    def values(self):
+        self.load_all()
+        return super(LazySessionData, self).values()
+
+    def items(self):
+        self.load_all()
+        return super(LazySessionData, self).items()
+
+    def update(self, *args, **kwargs):
+        self.load_all()
+        super(LazySessionData, self).update(*args, **kwargs)
+
+    def copy(self):
+        self.load_all()
+        return dict(super(LazySessionData, self).items())
+
+
+class SessionStore(cached_db.SessionStore):
+    """
+    Write-through cached, database backed session store.
+    """
+    @property
+    def lazy_keys(self):
+        return settings.SESSION_LAZY_KEYS
+
+    def load(self):
+        try:
+            data = self._cache.get(self.cache_key)
+        except Exception:
+            # Invalid cache keys raise on some backends, see cached_db
+            data = None
+
+        if data is None:
+            (data, expire_date) = self._load_from_db(self.session_key)
+            if data is None:
+                self._session_key = None
+                return {}
+            self._cache_data(data, self.get_expiry_age(expiry=expire_date))
+            return data
+
+        return LazySessionData(data, self.lazy_keys, partial(self._load_lazy_values, self.session_key))
+
+    def save(self, must_create=False):
+        data = getattr(self, '_session_cache', None)
+        if isinstance(data, LazySessionData):
+            data.load_all()
+        # Skip the cache write of cached_db, the data is cached below
+        cached_db.DBStore.save(self, must_create)
+        self._cache_data(self._session, self.get_expiry_age())
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            session_key = self.session_key
+        super(SessionStore, self).delete(session_key)
+        if session_key is not None:
+            self._cache.delete(self._get_lazy_cache_key(session_key))
+
+    def cache_from_db(self, session):
+        """
+        Cache the data of a session model instance.
+
+        :type session: django.contrib.sessions.models.Session
+        """
+        data = self.decode(session.session_data)
+        self._session_key = session.session_key
+        self._cache_data(data, self.get_expiry_age(expiry=session.expire_date))
+
+    def _cache_data(self, data, timeout):
+        data = dict(data.items())
+        lazy_values = {key: data.pop(key) for key in self.lazy_keys if key in data}
+        self._cache.set_many({
+            self.cache_key: data,
+            self._get_lazy_cache_key(self.session_key): lazy_values,
+        }, timeout)
+
+    def _load_lazy_values(self, session_key):
+        values = self._cache.get(self._get_lazy_cache_key(session_key))
+        if values is None:
+            data = self._load_from_db(session_key)[0] or {}
+            values = {key: data[key] for key in self.lazy_keys if key in data}
+        return values
+
+    def _load_from_db(self, session_key):
+        """
+        Load the data of a session from the database.
+
+        :rtype: (dict|None, datetime.datetime|None)
+        :return: Session data and its expiry date
+        """
+        try:
+            s = self.model.objects.get(
+                session_key=session_key,
+                expire_date__gt=timezone.now()
+            )
+            data = self.decode(s.session_data)
+        except (self.model.DoesNotExist, SuspiciousOperation) as e:
+            if isinstance(e, SuspiciousOperation):
+                logger = logging.getLogger('django.security.%s' % e.__class__.__name__)
+                logger.warning(force_text(e))
+            return (None, None)
+        return (data, s.expire_date)
+
+    def _get_lazy_cache_key(self, session_key):
+        return self.cache_key_prefix + session_key + LAZY_KEY_SUFFIX
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+
+REFRESHED_AT_KEY = '_session_refreshed_at'
+
+
+def refresh_session(request, expiry=None):
+    """
+    Extend the expiry of a session, saving it only when needed.
+
+    Marking the session modified on every request makes every request
+    write the session.  Instead the session is saved only if the
+    extension would move its expiry forward by more than the fraction
+    SESSION_REFRESH_FRACTION of the session lifetime.  Between the saves
+    the session stays valid for at least the rest of that lifetime.
+    A shortened expiry is always saved.
+
+    :type request: django.http.HttpRequest
+    :type expiry: int|float|None
+    :param expiry:
+      New lifetime of the session in seconds, or None for keeping the
+      current lifetime
+    :rtype: bool
+    :return: True if the session will be saved
+    """
+    session = request.session
+    lifetime = session.get_expiry_age() if expiry is None else int(expiry)
+    now = time.time()
+
+    refreshed_at = session.get(REFRESHED_AT_KEY)
+    if refreshed_at is not None:
+        expires_at = refreshed_at + session.get_expiry_age()
+        extension = now + lifetime - expires_at
+        # Shortening the expiry is always saved
+        if 0 <= extension < lifetime * settings.SESSION_REFRESH_FRACTION:
+            return False
+
+    if expiry is not None:
+        session.set_expiry(lifetime)
+    session[REFRESHED_AT_KEY] = int(now)
+    return True
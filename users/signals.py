@@ -1,6 +1,20 @@
+from allauth.account.models import EmailAddress
 from allauth.account.signals import user_logged_in as allauth_user_logged_in
+from allauth.socialaccount.models import SocialAccount, SocialApp
+from django.core.signals import setting_changed
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
+from helusers.models import ADGroupMapping
+from oauth2_provider.models import AccessToken
+
+from .authentication import evict_access_token
+from .cache import invalidate_user
+from .login_methods import invalidate_login_methods
+from .models import Application, LoginMethod, OidcClientOptions, User
+from .providers import load_provider_policies
+from .sessions import refresh_session
+from .userinfo import delete_userinfo_snapshot, refresh_userinfo_snapshot, refresh_userinfo_snapshot_by_id
 
 
 @receiver(allauth_user_logged_in)
@@ -17,6 +31,64 @@ def handle_allauth_login(sender, request, user, **kwargs):
         now = timezone.now()
         delta = login.token.expires_at - now
         assert delta.total_seconds() > 0
-        request.session.set_expiry(delta.total_seconds())
+        refresh_session(request, delta.total_seconds())
+    else:
+        refresh_session(request, 3600)
+
+
+@receiver(post_save, sender=User)
+def handle_user_save(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+    refresh_userinfo_snapshot(instance)
+
+
+@receiver(post_delete, sender=User)
+def handle_user_delete(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+    delete_userinfo_snapshot(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.ad_groups.through)
+def handle_ad_groups_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_user(instance.pk)
     else:
-        request.session.set_expiry(3600)
+        for user_id in (pk_set or []):
+            invalidate_user(user_id)
+
+
+@receiver([post_save, post_delete], sender=ADGroupMapping)
+def reset_ad_groups_hash_on_mapping_change(sender, instance, **kwargs):
+    # Make the next login of the group members sync their Django groups
+    User.objects.filter(ad_groups=instance.ad_group_id).update(ad_groups_hash='')
+
+
+@receiver([post_save, post_delete], sender=EmailAddress)
+@receiver([post_save, post_delete], sender=SocialAccount)
+def handle_user_related_change(sender, instance, **kwargs):
+    if instance.user_id:
+        invalidate_user(instance.user_id)
+        refresh_userinfo_snapshot_by_id(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=AccessToken)
+def evict_access_token_on_change(sender, instance, **kwargs):
+    evict_access_token(instance.token)
+
+
+@receiver([post_save, post_delete], sender=LoginMethod)
+@receiver([post_save, post_delete], sender=Application)
+@receiver([post_save, post_delete], sender=OidcClientOptions)
+@receiver([post_save, post_delete], sender=SocialApp)
+@receiver(m2m_changed, sender=Application.login_methods.through)
+@receiver(m2m_changed, sender=OidcClientOptions.login_methods.through)
+def invalidate_login_methods_on_change(sender, **kwargs):
+    invalidate_login_methods()
+
+
+@receiver(setting_changed)
+def reload_provider_policies_on_setting_change(setting, **kwargs):
+    if setting == 'SOCIALACCOUNT_PROVIDERS':
+        load_provider_policies()
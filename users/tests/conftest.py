@@ -7,9 +7,15 @@ from django.contrib.auth import get_user_model
 from django.utils.crypto import get_random_string
 from oidc_provider.models import Client
 
+from tunnistamo.cache import get_cache
 from users.models import Application, LoginMethod, OidcClientOptions
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    get_cache().clear()
+
+
 @pytest.fixture()
 def assertCountEqual():
     def do_test(a, b):
@@ -57,7 +63,7 @@ def application_factory():
         args.setdefault('name', get_random_string())
         args.setdefault('client_id', get_random_string())
         args.setdefault('user', None)
-        args.setdefault('redirect_uris', None)
+        args.setdefault('redirect_uris', '')
         args.setdefault('client_type', Application.CLIENT_PUBLIC)
         args.setdefault('authorization_grant_type', Application.GRANT_IMPLICIT)
 
@@ -76,7 +82,7 @@ def oidcclient_factory():
         args.setdefault('client_type', 'public')
         args.setdefault('client_id', get_random_string())
         args.setdefault('response_type', 'id_token token')
-        args.setdefault('redirect_uris', None)
+        args.setdefault('redirect_uris', [])
 
         instance = Client.objects.create(**args)
         instance.save()
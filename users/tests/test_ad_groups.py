@@ -0,0 +1,59 @@
+import pytest
+from django.contrib.auth.models import Group
+from helusers.models import ADGroup, ADGroupMapping
+
+
+def get_ad_group_names(user):
+    return sorted(user.ad_groups.values_list('name', flat=True))
+
+
+@pytest.mark.django_db
+def test_update_ad_groups_creates_missing_groups(user_factory):
+    ADGroup.objects.create(name='existing', display_name='Existing')
+    user = user_factory()
+
+    user.update_ad_groups(['Existing', 'New', 'NEW'])
+
+    assert get_ad_group_names(user) == ['existing', 'new']
+    assert ADGroup.objects.count() == 2
+    assert ADGroup.objects.get(name='new').display_name == 'New'
+
+
+@pytest.mark.django_db
+def test_update_ad_groups_changes_only_the_difference(user_factory):
+    user = user_factory()
+    user.update_ad_groups(['a', 'b'])
+    membership_ids = dict(user.ad_groups.through.objects.values_list('adgroup__name', 'id'))
+
+    user.update_ad_groups(['b', 'c'])
+
+    assert get_ad_group_names(user) == ['b', 'c']
+    assert user.ad_groups.through.objects.get(adgroup__name='b').id == membership_ids['b']
+
+
+@pytest.mark.django_db
+def test_update_ad_groups_is_skipped_when_unchanged(user_factory, django_assert_num_queries):
+    user = user_factory()
+    user.update_ad_groups(['a', 'b'])
+
+    with django_assert_num_queries(0):
+        user.update_ad_groups(['B', 'a'])
+
+    assert get_ad_group_names(user) == ['a', 'b']
+
+
+@pytest.mark.django_db
+def test_update_ad_groups_syncs_mapped_django_groups(user_factory):
+    group = Group.objects.create(name='staff')
+    ad_group = ADGroup.objects.create(name='a', display_name='a')
+    user = user_factory()
+    user.update_ad_groups(['a'])
+    assert not user.groups.exists()
+
+    ADGroupMapping.objects.create(group=group, ad_group=ad_group)
+    user.refresh_from_db()
+    user.update_ad_groups(['a'])
+    assert list(user.groups.all()) == [group]
+
+    user.update_ad_groups([])
+    assert not user.groups.exists()
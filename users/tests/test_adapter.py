@@ -8,7 +8,10 @@ from django.test import RequestFactory
 from django.urls import reverse
 from django.utils.crypto import get_random_string
 
+from users.adapter import filter_email_addresses, link_by_trusted_email
+from users.cache import get_user_version
 from users.models import User
+from users.userinfo import get_userinfo_snapshot
 
 
 @pytest.mark.django_db
@@ -32,6 +35,31 @@ def test_is_open_for_signup_duplicate_email(user_factory, emailaddress_factory,
     assert get_adapter(request).is_open_for_signup(request, sociallogin) is False
 
 
+@pytest.mark.django_db
+def test_is_open_for_signup_duplicate_email_different_case(user_factory, socialaccount_factory):
+    user1 = user_factory(email='{}@Example.com'.format(get_random_string()))
+    socialaccount_factory(user=user1, provider='facebook')
+
+    request = RequestFactory().get('/accounts/signup/')
+    request.user = AnonymousUser()
+
+    user2 = User(email=user1.email.upper())
+    account = SocialAccount(provider='google', uid='123')
+    sociallogin = SocialLogin(user=user2, account=account)
+
+    assert get_adapter(request).is_open_for_signup(request, sociallogin) is False
+
+
+@pytest.mark.django_db
+def test_filter_email_addresses(user_factory, emailaddress_factory):
+    user = user_factory()
+    email_address = emailaddress_factory(user=user, email='First.Last@Example.com')
+    emailaddress_factory(user=user, email='other@example.com')
+
+    assert list(filter_email_addresses(['first.last@example.com'])) == [email_address]
+    assert list(filter_email_addresses(['First.Last@Example.com'])) == []
+
+
 @pytest.mark.django_db
 @pytest.mark.parametrize('provider_id, expected', (
     (None, False),
@@ -69,3 +97,78 @@ def test_handle_facebook_without_email_cancel():
 
     assert response.status_code == 302
     assert response['location'] == reverse('socialaccount_login_cancelled')
+
+
+@pytest.mark.django_db
+def test_link_by_trusted_email(user_factory, emailaddress_factory):
+    email = '{}@example.com'.format(get_random_string())
+    other_email = '{}@example.com'.format(get_random_string())
+    user1 = user_factory(email=email)
+    emailaddress_factory(user=user1, email=email, verified=True)
+    user2 = user_factory(email=email.upper())
+    emailaddress_factory(user=user2, email=email.upper(), verified=False)
+    emailaddress_factory(user=user2, email=other_email, verified=True)
+    user3 = user_factory(email=email.title())
+    emailaddress_factory(user=user3, email=email.title(), verified=False)
+
+    request = RequestFactory().get('/accounts/login/callback/')
+    account = SocialAccount(provider='google', uid=get_random_string())
+    sociallogin = SocialLogin(user=User(), account=account, email_addresses=[
+        EmailAddress(email=email, verified=True),
+    ])
+
+    link_by_trusted_email(request, sociallogin)
+
+    assert sociallogin.user == user1
+    assert SocialAccount.objects.get(uid=account.uid).user == user1
+    assert list(EmailAddress.objects.filter(email__iexact=email)) == [EmailAddress.objects.get(user=user1)]
+    user2.refresh_from_db()
+    assert user2.email == other_email
+    assert user2.normalized_email == other_email.lower()
+    user3.refresh_from_db()
+    assert user3.email == ''
+
+
+@pytest.mark.django_db
+def test_link_by_trusted_email_connects_last_match(user_factory, emailaddress_factory):
+    email = '{}@example.com'.format(get_random_string())
+    other_email = '{}@example.com'.format(get_random_string())
+    users = [user_factory() for _ in range(3)]
+    emailaddress_factory(user=users[2], email=email, verified=True)
+    emailaddress_factory(user=users[0], email=other_email, verified=True)
+    emailaddress_factory(user=users[1], email=other_email.upper(), verified=True)
+
+    request = RequestFactory().get('/accounts/login/callback/')
+    account = SocialAccount(provider='google', uid=get_random_string())
+    sociallogin = SocialLogin(user=User(), account=account, email_addresses=[
+        EmailAddress(email=email, verified=True),
+        EmailAddress(email=other_email, verified=True),
+    ])
+
+    link_by_trusted_email(request, sociallogin)
+
+    # The matches of the last email win, and of them the last address
+    assert sociallogin.user == users[1]
+    assert SocialAccount.objects.get(uid=account.uid).user == users[1]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_link_by_trusted_email_refreshes_updated_users(user_factory, emailaddress_factory):
+    email = '{}@example.com'.format(get_random_string())
+    other_email = '{}@example.com'.format(get_random_string())
+    emailaddress_factory(user=user_factory(email=email), email=email, verified=True)
+    user = user_factory(email=email.upper())
+    emailaddress_factory(user=user, email=email.upper(), verified=False)
+    emailaddress_factory(user=user, email=other_email, verified=True)
+    assert get_userinfo_snapshot(user)['email'] == user.email
+    version = get_user_version(user.pk)
+
+    request = RequestFactory().get('/accounts/login/callback/')
+    account = SocialAccount(provider='google', uid=get_random_string())
+    sociallogin = SocialLogin(user=User(), account=account, email_addresses=[
+        EmailAddress(email=email, verified=True),
+    ])
+    link_by_trusted_email(request, sociallogin)
+
+    assert get_user_version(user.pk) != version
+    assert get_userinfo_snapshot(User.objects.get(pk=user.pk))['email'] == other_email
@@ -0,0 +1,56 @@
+import datetime
+
+import pytest
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from oauth2_provider.models import AccessToken
+
+from users.authentication import get_cache_stats, reset_cache_stats
+
+
+@pytest.fixture()
+def access_token(user_factory, application_factory):
+    return AccessToken.objects.create(
+        user=user_factory(),
+        application=application_factory(),
+        token=get_random_string(),
+        expires=timezone.now() + datetime.timedelta(hours=1),
+        scope='read write')
+
+
+def get_user(client, access_token):
+    return client.get('/user/', HTTP_AUTHORIZATION='Bearer {}'.format(access_token.token))
+
+
+@pytest.mark.django_db
+def test_validated_token_is_cached(client, access_token):
+    reset_cache_stats()
+
+    response1 = get_user(client, access_token)
+    response2 = get_user(client, access_token)
+
+    assert response1.status_code == response2.status_code == 200
+    assert response2.data['username'] == access_token.user.username
+    assert get_cache_stats() == {'local_hits': 1, 'shared_hits': 0, 'misses': 1}
+
+
+@pytest.mark.django_db
+def test_revoked_token_is_evicted(client, access_token):
+    assert get_user(client, access_token).status_code == 200
+
+    access_token.revoke()
+
+    assert get_user(client, access_token).status_code == 401
+
+
+@pytest.mark.django_db
+def test_cached_token_is_dropped_on_user_change(client, access_token):
+    get_user(client, access_token)
+    reset_cache_stats()
+
+    access_token.user.first_name = 'Changed'
+    access_token.user.save()
+    response = get_user(client, access_token)
+
+    assert response.data['first_name'] == 'Changed'
+    assert get_cache_stats()['misses'] == 1
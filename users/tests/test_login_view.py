@@ -1,8 +1,11 @@
 import pytest
+from django.conf import settings
 from django.urls import reverse
 from django.utils.crypto import get_random_string
 from django.utils.http import urlquote
 
+from tunnistamo.cache import get_cache
+
 
 @pytest.mark.django_db
 def test_login_view_next_url(client, assertCountEqual, loginmethod_factory, application_factory):
@@ -127,3 +130,75 @@ def test_login_view_loginmethods_per_oidcclient(client, assertCountEqual, loginm
     response = client.get('/login/', params)
 
     assertCountEqual(response.context['login_methods'], login_methods)
+
+
+@pytest.mark.django_db
+def test_login_view_no_queries_on_warm_cache(client, django_assert_num_queries, loginmethod_factory,
+                                             application_factory):
+    lm1 = loginmethod_factory(provider_id='facebook')
+    lm2 = loginmethod_factory(provider_id='github')
+    app = application_factory(redirect_uris=['http://example.com/'])
+    app.login_methods.set([lm1, lm2])
+    params = {
+        "next": "http://example.com/?client_id={}".format(app.client_id),
+    }
+    client.get('/login/', params)
+
+    with django_assert_num_queries(0):
+        response = client.get('/login/', params)
+
+    content = response.content.decode('utf-8')
+    assert reverse('facebook_login') + '?next=' + urlquote(params['next']) in content
+    assert reverse('github_login') + '?next=' + urlquote(params['next']) in content
+
+
+@pytest.mark.django_db
+def test_login_view_login_method_change(client, loginmethod_factory):
+    loginmethod_factory(provider_id='facebook')
+    lm2 = loginmethod_factory(provider_id='github')
+
+    response = client.get('/login/')
+    assert len(response.context['login_methods']) == 2
+
+    lm2.delete()
+
+    response = client.get('/login/')
+    assert response.status_code == 302
+    assert response['location'] == reverse('facebook_login')
+
+
+@pytest.mark.django_db
+def test_login_view_cached_page_next_url(client, loginmethod_factory):
+    loginmethod_factory(provider_id='facebook')
+    loginmethod_factory(provider_id='github')
+
+    client.get('/login/', {'next': 'http://example.com/first/'})
+    response = client.get('/login/', {'next': 'http://example.com/second/'})
+
+    content = response.content.decode('utf-8')
+    assert reverse('facebook_login') + '?next=http%3A//example.com/second/' in content
+    assert 'first' not in content
+    assert 'max-age={}'.format(settings.LOGIN_PAGE_CACHE_MAX_AGE) in response['Cache-Control']
+
+    response = client.get('/login/')
+
+    content = response.content.decode('utf-8')
+    assert '?next=' not in content
+
+
+@pytest.mark.django_db
+def test_login_view_unknown_clients_share_cache(client, loginmethod_factory):
+    loginmethod_factory(provider_id='facebook')
+    loginmethod_factory(provider_id='github')
+    client.get('/login/', {'next': 'http://example.com/'})
+    cache_keys = set(get_cache()._cache)
+
+    for _ in range(3):
+        response = client.get('/login/', {
+            'next': 'http://example.com/?client_id={}'.format(get_random_string()),
+        })
+        content = response.content.decode('utf-8')
+        assert reverse('facebook_login') in content
+        assert reverse('github_login') in content
+
+    assert set(get_cache()._cache) == cache_keys
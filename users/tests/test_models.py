@@ -12,3 +12,14 @@ def test_user_primary_sid(user_factory):
     )
 
     assert user.primary_sid is not None
+
+
+@pytest.mark.django_db
+def test_user_normalized_email(user_factory):
+    user = user_factory(email='First.Last@Example.COM')
+    assert user.normalized_email == 'first.last@example.com'
+
+    user.email = 'Other@Example.COM'
+    user.save(update_fields=['email'])
+    user.refresh_from_db()
+    assert user.normalized_email == 'other@example.com'
@@ -0,0 +1,21 @@
+import pytest
+
+from users.adapter import clean_helsinki_adfs_attributes, handle_facebook_without_email
+from users.providers import DEFAULT_POLICY, get_provider_policy
+
+
+def test_provider_policies():
+    adfs_policy = get_provider_policy('helsinki_adfs')
+    assert adfs_policy.auto_signup is True
+    assert adfs_policy.attribute_cleaner is clean_helsinki_adfs_attributes
+
+    assert get_provider_policy('facebook').missing_email_handler is handle_facebook_without_email
+    assert get_provider_policy('unknown') == DEFAULT_POLICY
+
+
+@pytest.mark.parametrize('trusted', (True, False))
+def test_provider_policies_are_reloaded_on_settings_change(settings, trusted):
+    settings.SOCIALACCOUNT_PROVIDERS = {'google': {'TRUSTED': trusted}}
+
+    assert get_provider_policy('google').trusted is trusted
+    assert get_provider_policy('helsinki_adfs').trusted is False
@@ -0,0 +1,79 @@
+import datetime
+from io import StringIO
+
+import pytest
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from oauth2_provider.models import AccessToken, Grant
+from oidc_provider.models import Token
+
+from users.token_pruning import prune_in_batches
+
+
+@pytest.fixture()
+def expired_and_valid_rows(user_factory, application_factory, oidcclient_factory):
+    now = timezone.now()
+    user = user_factory()
+    app = application_factory()
+    oidc_client = oidcclient_factory()
+    rows = {'expired': [], 'valid': []}
+    for (state, delta) in [('expired', -datetime.timedelta(hours=1)), ('valid', datetime.timedelta(hours=1))]:
+        rows[state] += [
+            AccessToken.objects.create(
+                user=user, application=app, token=get_random_string(), expires=now + delta),
+            Grant.objects.create(
+                user=user, application=app, code=get_random_string(), expires=now + delta,
+                redirect_uri='http://example.com/'),
+        ]
+        session = SessionStore()
+        session.create()
+        Session.objects.filter(session_key=session.session_key).update(expire_date=now + delta)
+        rows[state].append(Session.objects.get(session_key=session.session_key))
+    rows['expired'].append(Token.objects.create(
+        user=user, client=oidc_client, access_token=get_random_string(), refresh_token=get_random_string(),
+        expires_at=now - datetime.timedelta(days=31)))
+    # Refresh token of a recently expired OIDC token is still usable
+    rows['valid'].append(Token.objects.create(
+        user=user, client=oidc_client, access_token=get_random_string(), refresh_token=get_random_string(),
+        expires_at=now - datetime.timedelta(hours=1)))
+    return rows
+
+
+def exists(instance):
+    return type(instance).objects.filter(pk=instance.pk).exists()
+
+
+@pytest.mark.django_db
+def test_prune_tokens(expired_and_valid_rows):
+    call_command('prune_tokens', batch_size=1, sleep=0, stdout=StringIO())
+
+    assert not any(exists(row) for row in expired_and_valid_rows['expired'])
+    assert all(exists(row) for row in expired_and_valid_rows['valid'])
+
+
+@pytest.mark.django_db
+def test_prune_tokens_dry_run(expired_and_valid_rows):
+    out = StringIO()
+    call_command('prune_tokens', dry_run=True, sleep=0, stdout=out)
+
+    assert all(exists(row) for row in expired_and_valid_rows['expired'])
+    assert 'Would prune 1 oidc_provider.Token rows' in out.getvalue()
+    assert 'Would prune {} rows in total'.format(len(expired_and_valid_rows['expired'])) in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_prune_in_batches(user_factory, application_factory):
+    user = user_factory()
+    app = application_factory()
+    for i in range(5):
+        AccessToken.objects.create(
+            user=user, application=app, token=get_random_string(),
+            expires=timezone.now() - datetime.timedelta(hours=1))
+
+    batches = list(prune_in_batches(AccessToken.objects.all(), batch_size=2))
+
+    assert batches == [2, 2, 1]
+    assert not AccessToken.objects.exists()
@@ -0,0 +1,89 @@
+import pytest
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.management import call_command
+
+from users.session_store import LazySessionData, SessionStore
+
+
+@pytest.fixture()
+def session_engine(settings):
+    settings.SESSION_ENGINE = 'users.session_store'
+    settings.SESSION_CACHE_ALIAS = 'default'
+    settings.SESSION_LAZY_KEYS = ['login_methods']
+
+
+def create_session(store_class, data):
+    session = store_class()
+    session.update(data)
+    session.create()
+    return session.session_key
+
+
+@pytest.mark.django_db
+def test_session_is_read_from_cache(session_engine, django_assert_num_queries):
+    key = create_session(SessionStore, {'foo': 'bar', 'login_methods': ['github']})
+
+    with django_assert_num_queries(0):
+        session = SessionStore(key)
+        assert session['foo'] == 'bar'
+        assert session['login_methods'] == ['github']
+
+
+@pytest.mark.django_db
+def test_lazy_keys_are_loaded_on_access(session_engine):
+    key = create_session(SessionStore, {'foo': 'bar', 'login_methods': ['github']})
+
+    session = SessionStore(key)
+    assert session['foo'] == 'bar'
+    data = session._session_cache
+    assert isinstance(data, LazySessionData)
+    assert not data.is_loaded
+
+    assert session.get('login_methods') == ['github']
+    assert data.is_loaded
+
+
+@pytest.mark.django_db
+def test_lazy_keys_fall_back_to_database(session_engine):
+    key = create_session(SessionStore, {'foo': 'bar', 'login_methods': ['github']})
+    session = SessionStore(key)
+    session._cache.delete(session._get_lazy_cache_key(key))
+
+    assert session['login_methods'] == ['github']
+
+
+@pytest.mark.django_db
+def test_lazy_keys_are_kept_on_save_and_cycle_key(session_engine):
+    key = create_session(SessionStore, {'foo': 'bar', 'login_methods': ['github']})
+
+    session = SessionStore(key)
+    session['foo'] = 'baz'
+    session.cycle_key()
+    session.save()
+
+    session = SessionStore(session.session_key)
+    assert session['foo'] == 'baz'
+    assert session['login_methods'] == ['github']
+    assert not SessionStore().exists(key)
+
+
+@pytest.mark.django_db
+def test_database_sessions_are_migrated(session_engine, django_assert_num_queries):
+    key = create_session(DBStore, {'foo': 'bar', 'login_methods': ['github']})
+
+    call_command('warm_session_cache')
+
+    with django_assert_num_queries(0):
+        session = SessionStore(key)
+        assert session['foo'] == 'bar'
+        assert session['login_methods'] == ['github']
+
+
+@pytest.mark.django_db
+def test_database_sessions_are_cached_on_first_use(session_engine, django_assert_num_queries):
+    key = create_session(DBStore, {'foo': 'bar'})
+
+    assert SessionStore(key)['foo'] == 'bar'
+
+    with django_assert_num_queries(0):
+        assert SessionStore(key)['foo'] == 'bar'
@@ -0,0 +1,58 @@
+import pytest
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import RequestFactory
+
+from users import sessions
+from users.sessions import refresh_session
+
+
+@pytest.fixture()
+def session_request():
+    request = RequestFactory().get('/')
+    request.session = SessionStore()
+    request.session.save()
+    return request
+
+
+def reload_session(request):
+    request.session.save()
+    request.session = SessionStore(request.session.session_key)
+
+
+@pytest.fixture()
+def frozen_time(monkeypatch):
+    now = [1500000000.0]
+    monkeypatch.setattr(sessions.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.mark.django_db
+def test_refresh_session_saves_only_when_expiry_has_aged(settings, session_request, frozen_time):
+    settings.SESSION_REFRESH_FRACTION = 0.1
+    session_request.session.set_expiry(3600)
+
+    assert refresh_session(session_request)
+    reload_session(session_request)
+
+    frozen_time[0] += 300
+    assert not refresh_session(session_request)
+    assert not session_request.session.modified
+
+    frozen_time[0] += 100
+    assert refresh_session(session_request)
+    assert session_request.session.modified
+
+
+@pytest.mark.django_db
+def test_refresh_session_with_expiry(settings, session_request, frozen_time):
+    settings.SESSION_REFRESH_FRACTION = 0.1
+    assert refresh_session(session_request, 3600)
+    reload_session(session_request)
+
+    frozen_time[0] += 60
+    assert not refresh_session(session_request, 3600)
+    assert session_request.session.get_expiry_age() == 3600
+
+    # A shorter expiry is saved right away
+    assert refresh_session(session_request, 600)
+    assert session_request.session.get_expiry_age() == 600
@@ -0,0 +1,84 @@
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.db import transaction
+
+from tunnistamo.cache import get_cache
+from tunnistamo.oidc import get_userinfo
+from users.userinfo import get_userinfo_snapshot
+
+
+@pytest.mark.django_db(transaction=True)
+def test_userinfo_uses_snapshot(django_assert_num_queries, user_factory, emailaddress_factory):
+    user = user_factory(first_name='Test', last_name='User')
+    emailaddress_factory(user=user, email='primary@example.com', primary=True, verified=True)
+
+    with django_assert_num_queries(0):
+        claims = get_userinfo({}, user)
+
+    assert claims['given_name'] == 'Test'
+    assert claims['family_name'] == 'User'
+    assert claims['email'] == 'primary@example.com'
+    assert claims['email_verified'] is True
+
+
+@pytest.mark.django_db(transaction=True)
+def test_snapshot_is_refreshed_on_changes(user_factory, emailaddress_factory, socialaccount_factory):
+    user = user_factory(email='user@example.com')
+    assert get_userinfo_snapshot(user)['email'] == 'user@example.com'
+
+    email_address = emailaddress_factory(user=user, email='primary@example.com', primary=True)
+    assert get_userinfo_snapshot(user)['email'] == 'primary@example.com'
+
+    email_address.delete()
+    assert get_userinfo_snapshot(user)['email'] == 'user@example.com'
+
+    socialaccount_factory(user=user, provider='github', extra_data={'login': 'octocat'})
+    assert get_userinfo_snapshot(user)['github_username'] == 'octocat'
+
+
+@pytest.mark.django_db
+def test_rebuild_userinfo_snapshots_command(django_assert_num_queries, user_factory, emailaddress_factory):
+    users = [user_factory() for _ in range(3)]
+    emailaddress_factory(user=users[0], email='primary@example.com', primary=True)
+    get_cache().clear()
+
+    call_command('rebuild_userinfo_snapshots', batch_size=2)
+
+    with django_assert_num_queries(0):
+        snapshots = [get_userinfo_snapshot(user) for user in users]
+    assert snapshots[0]['email'] == 'primary@example.com'
+    assert [x['email'] for x in snapshots[1:]] == [x.email for x in users[1:]]
+
+
+class Rollback(Exception):
+    pass
+
+
+@pytest.mark.django_db(transaction=True)
+def test_snapshot_is_stored_on_commit(settings, user_factory):
+    user = user_factory(first_name='Old')
+
+    with transaction.atomic():
+        user.first_name = 'New'
+        user.save()
+        assert get_userinfo_snapshot(user)['first_name'] == 'Old'
+    assert get_userinfo_snapshot(user)['first_name'] == 'New'
+
+    with pytest.raises(Rollback):
+        with transaction.atomic():
+            user.first_name = 'Rolled back'
+            user.save()
+            raise Rollback()
+    assert get_userinfo_snapshot(user)['first_name'] == 'New'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_snapshot_timeout(settings, user_factory):
+    settings.USERINFO_SNAPSHOT_TIMEOUT = 60
+    user = user_factory()
+
+    with mock.patch.object(get_cache(), 'set') as set_mock:
+        user.save()
+    assert set_mock.call_args[1] == {'timeout': 60}
@@ -0,0 +1,89 @@
+import datetime
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+from oauth2_provider.models import get_access_token_model, get_grant_model, get_refresh_token_model
+from oauth2_provider.settings import oauth2_settings
+from oidc_provider.models import Code, Token, UserConsent
+
+PruneTarget = namedtuple('PruneTarget', ['name', 'queryset'])
+
+
+def get_prune_targets(now=None):
+    """
+    Get the querysets of the expired rows to prune.
+
+    Refresh tokens of django-oauth-toolkit are pruned like its
+    cleartokens command does.  OIDC tokens are kept for
+    TOKEN_PRUNE_OIDC_TOKEN_RETENTION after their expiry, because their
+    refresh tokens are stored in the same rows.
+
+    :type now: datetime.datetime|None
+    :rtype: list[PruneTarget]
+    """
+    if now is None:
+        now = timezone.now()
+    targets = []
+
+    refresh_token_lifetime = oauth2_settings.REFRESH_TOKEN_EXPIRE_SECONDS
+    if refresh_token_lifetime:
+        if not isinstance(refresh_token_lifetime, datetime.timedelta):
+            refresh_token_lifetime = datetime.timedelta(seconds=refresh_token_lifetime)
+        targets.append(PruneTarget('oauth2_provider.RefreshToken', get_refresh_token_model().objects.filter(
+            access_token__expires__lt=now - refresh_token_lifetime)))
+    targets += [
+        PruneTarget('oauth2_provider.AccessToken', get_access_token_model().objects.filter(
+            refresh_token__isnull=True, expires__lt=now)),
+        PruneTarget('oauth2_provider.Grant', get_grant_model().objects.filter(
+            expires__lt=now)),
+        PruneTarget('oidc_provider.Code', Code.objects.filter(
+            expires_at__lt=now)),
+        PruneTarget('oidc_provider.Token', Token.objects.filter(
+            expires_at__lt=now - settings.TOKEN_PRUNE_OIDC_TOKEN_RETENTION)),
+        PruneTarget('oidc_provider.UserConsent', UserConsent.objects.filter(
+            expires_at__lt=now)),
+        PruneTarget('sessions.Session', Session.objects.filter(
+            expire_date__lt=now)),
+    ]
+    return targets
+
+
+def prune_in_batches(queryset, batch_size=1000, sleep=0, dry_run=False):
+    """
+    Delete the rows of a queryset in primary key ordered batches.
+
+    Each batch is selected by its primary keys starting after the last
+    key of the previous batch, so that no batch needs to skip over
+    already processed rows and every delete locks at most batch_size
+    rows.
+
+    :type queryset: django.db.models.QuerySet
+    :type batch_size: int
+    :type sleep: float
+    :param sleep: Seconds to sleep between the batches
+    :type dry_run: bool
+    :param dry_run: Only count the rows without deleting them
+    :rtype: Iterator[int]
+    :return: Number of the rows pruned in each batch
+    """
+    model = queryset.model
+    pk_queryset = queryset.order_by('pk').values_list('pk', flat=True)
+    last_pk = None
+    while True:
+        batch_queryset = pk_queryset
+        if last_pk is not None:
+            batch_queryset = batch_queryset.filter(pk__gt=last_pk)
+        pks = list(batch_queryset[:batch_size])
+        if not pks:
+            break
+        if not dry_run:
+            model.objects.filter(pk__in=pks).delete()
+        last_pk = pks[-1]
+        yield len(pks)
+        if len(pks) < batch_size:
+            break
+        if sleep:
+            time.sleep(sleep)
@@ -0,0 +1,157 @@
+from allauth.account.models import EmailAddress
+from allauth.socialaccount.models import SocialAccount
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Prefetch
+
+from tunnistamo.cache import get_cache
+
+
+def get_userinfo_snapshot(user):
+    """
+    Get the userinfo claims snapshot of a user.
+
+    The snapshot is a denormalized dictionary of the data that the
+    userinfo claims are built from.  It is read from the cache and built
+    only if it's missing.
+
+    :type user: users.models.User
+    :rtype: dict
+    """
+    if user.pk is None:
+        return build_userinfo_snapshot(user)
+    snapshot = get_cache().get(_get_cache_key(user.pk))
+    if snapshot is None:
+        snapshot = refresh_userinfo_snapshot(user)
+    return snapshot
+
+
+def refresh_userinfo_snapshot(user):
+    """
+    Rebuild and store the userinfo claims snapshot of a user.
+
+    The snapshot is stored when the current transaction is committed, so
+    that an uncommitted or rolled back state never ends up in the cache.
+
+    :type user: users.models.User
+    :rtype: dict
+    """
+    snapshot = build_userinfo_snapshot(user)
+    key = _get_cache_key(user.pk)
+    transaction.on_commit(lambda: get_cache().set(
+        key, snapshot, timeout=settings.USERINFO_SNAPSHOT_TIMEOUT))
+    return snapshot
+
+
+def refresh_userinfo_snapshot_by_id(user_id):
+    """
+    Rebuild the userinfo claims snapshot of a user by user id.
+
+    The snapshot is removed if the user doesn't exist anymore.
+
+    :type user_id: int
+    """
+    user = get_user_model().objects.filter(pk=user_id).first()
+    if user:
+        refresh_userinfo_snapshot(user)
+    else:
+        delete_userinfo_snapshot(user_id)
+
+
+def delete_userinfo_snapshot(user_id):
+    """
+    Remove the userinfo claims snapshot of a user.
+
+    The snapshot is removed right away and once more when the current
+    transaction is committed, in case another process stored it again
+    in between.
+
+    :type user_id: int
+    """
+    key = _get_cache_key(user_id)
+    get_cache().delete(key)
+    transaction.on_commit(lambda: get_cache().delete(key))
+
+
+def rebuild_userinfo_snapshots(queryset=None, batch_size=500):
+    """
+    Rebuild the userinfo claims snapshots of users in batches.
+
+    :type queryset: django.db.models.QuerySet|None
+    :param queryset: Users to rebuild the snapshots for, defaults to all
+    :type batch_size: int
+    :rtype: int
+    :return: Number of rebuilt snapshots
+    """
+    if queryset is None:
+        queryset = get_user_model().objects.all()
+    queryset = queryset.order_by('pk').prefetch_related(
+        Prefetch('emailaddress_set',
+                 queryset=EmailAddress.objects.filter(primary=True),
+                 to_attr='primary_email_addresses'),
+        Prefetch('socialaccount_set',
+                 queryset=SocialAccount.objects.filter(provider='github'),
+                 to_attr='github_accounts'))
+    count = 0
+    last_pk = None
+    while True:
+        batch_queryset = queryset
+        if last_pk is not None:
+            batch_queryset = batch_queryset.filter(pk__gt=last_pk)
+        users = list(batch_queryset[:batch_size])
+        if not users:
+            break
+        get_cache().set_many({
+            _get_cache_key(user.pk): build_userinfo_snapshot(
+                user,
+                email_address=next(iter(user.primary_email_addresses), None),
+                github_account=next(iter(user.github_accounts), None))
+            for user in users
+        }, timeout=settings.USERINFO_SNAPSHOT_TIMEOUT)
+        count += len(users)
+        last_pk = users[-1].pk
+    return count
+
+
+def build_userinfo_snapshot(user, email_address=False, github_account=False):
+    """
+    Build the userinfo claims snapshot of a user.
+
+    :type user: users.models.User
+    :type email_address: EmailAddress|None|bool
+    :param email_address:
+      Primary email address of the user, if already known.  Looked up
+      from the database when not given.
+    :type github_account: SocialAccount|None|bool
+    :param github_account:
+      GitHub account of the user, if already known.  Looked up from the
+      database when not given.
+    :rtype: dict
+    """
+    can_query = user.pk is not None
+    if email_address is False:
+        email_address = (
+            user.emailaddress_set.filter(primary=True).first()
+            if can_query and hasattr(user, 'emailaddress_set') else None)
+    if github_account is False:
+        github_account = (
+            user.socialaccount_set.filter(provider='github').first()
+            if can_query and hasattr(user, 'socialaccount_set') else None)
+
+    return {
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'full_name': user.get_full_name(),
+        'short_name': user.get_short_name(),
+        'email': email_address.email if email_address else user.email,
+        'email_verified': (
+            email_address.verified if email_address else False),
+        'github_username': (
+            github_account.extra_data.get('login')
+            if github_account else None),
+    }
+
+
+def _get_cache_key(user_id):
+    return 'users:userinfo:{}'.format(user_id)
@@ -1,15 +1,20 @@
+import copy
+import hashlib
 import re
 from urllib.parse import parse_qs, urlparse
 
-from allauth.socialaccount import providers
+from django.conf import settings
 from django.contrib.auth import logout as auth_logout
+from django.http import HttpResponse
 from django.shortcuts import redirect
+from django.utils.cache import patch_cache_control
 from django.utils.http import quote
+from django.utils.translation import get_language
 from django.views.generic.base import TemplateView
-from oauth2_provider.models import get_application_model
-from oidc_provider.models import Client
 
-from .models import LoginMethod, OidcClientOptions
+from tunnistamo.cache import get_cache, get_version
+
+from .login_methods import LOGIN_METHODS_VERSION, get_login_methods, get_login_methods_client_id
 
 
 class LoginView(TemplateView):
@@ -17,8 +22,7 @@ class LoginView(TemplateView):
 
     def get(self, request, *args, **kwargs):
         next_url = request.GET.get('next')
-        app = None
-        oidc_client = None
+        client_id = None
 
         if next_url:
             # Determine application from the 'next' query argument.
@@ -29,61 +33,70 @@ class LoginView(TemplateView):
             if client_id and len(client_id):
                 client_id = client_id[0].strip()
 
-            if client_id:
-                try:
-                    app = get_application_model().objects.get(client_id=client_id)
-                except get_application_model().DoesNotExist:
-                    pass
-
-                try:
-                    oidc_client = Client.objects.get(client_id=client_id)
-                except Client.DoesNotExist:
-                    pass
-
             next_url = quote(next_url)
 
-        allowed_methods = None
-        if app:
-            allowed_methods = app.login_methods.all()
-        elif oidc_client:
-            try:
-                client_options = OidcClientOptions.objects.get(oidc_client=oidc_client)
-                allowed_methods = client_options.login_methods.all()
-            except OidcClientOptions.DoesNotExist:
-                pass
-
-        if allowed_methods is None:
-            allowed_methods = LoginMethod.objects.all()
-
-        provider_map = providers.registry.provider_map
-        methods = []
-        for m in allowed_methods:
-            assert isinstance(m, LoginMethod)
-            if m.provider_id == 'saml':
-                continue  # SAML support removed
-            else:
-                try:
-                    provider_cls = provider_map[m.provider_id]
-                except KeyError:
-                    continue
-                provider = provider_cls(request)
-                login_url = provider.get_login_url(request=self.request)
-                if next_url:
-                    login_url += '?next=' + next_url
-            m.login_url = login_url
-            methods.append(m)
+        client_id = get_login_methods_client_id(client_id or None)
+        base_methods = get_login_methods(client_id, request)
+        methods = _add_next_url(base_methods, next_url)
 
         if len(methods) == 1:
             return redirect(methods[0].login_url)
 
-        self.login_methods = methods
-        return super(LoginView, self).get(request, *args, **kwargs)
+        # The rendered page is cached with a placeholder in place of the
+        # next URL, which is then filled in for each request
+        cache = get_cache()
+        cache_key = self._get_page_cache_key(client_id, bool(next_url))
+        content = cache.get(cache_key)
+        if content is not None:
+            response = HttpResponse(
+                content.replace(NEXT_URL_PLACEHOLDER, next_url or ''))
+        else:
+            response = self._render(methods)
+            if next_url:
+                content = self._render(_add_next_url(
+                    base_methods, NEXT_URL_PLACEHOLDER)).content
+            else:
+                content = response.content
+            cache.set(cache_key, content.decode(response.charset),
+                      timeout=settings.LOGIN_PAGE_CACHE_TIMEOUT)
+
+        patch_cache_control(
+            response, public=True, max_age=settings.LOGIN_PAGE_CACHE_MAX_AGE)
+        return response
 
     def get_context_data(self, **kwargs):
         context = super(LoginView, self).get_context_data(**kwargs)
         context['login_methods'] = self.login_methods
         return context
 
+    def _render(self, login_methods):
+        self.login_methods = login_methods
+        return self.render_to_response(self.get_context_data()).render()
+
+    def _get_page_cache_key(self, client_id, has_next_url):
+        key_data = '\n'.join([
+            client_id or '',
+            get_language() or '',
+            self.template_name,  # The template defines the theme
+            'next' if has_next_url else '',
+        ])
+        return 'users:login_page:{version}:{hash}'.format(
+            version=get_version(LOGIN_METHODS_VERSION),
+            hash=hashlib.sha256(key_data.encode('utf-8')).hexdigest())
+
+
+NEXT_URL_PLACEHOLDER = 'TUNNISTAMO_NEXT_URL_PLACEHOLDER'
+
+
+def _add_next_url(login_methods, next_url):
+    methods = []
+    for m in login_methods:
+        m = copy.copy(m)
+        if next_url:
+            m.login_url += '?next=' + next_url
+        methods.append(m)
+    return methods
+
 
 class LogoutView(TemplateView):
     template_name = 'logout_done.html'
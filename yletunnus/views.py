@@ -1,7 +1,9 @@
 import jwt
-from allauth.socialaccount.providers.oauth2.views import OAuth2Adapter, OAuth2CallbackView, OAuth2LoginView
+from allauth.socialaccount.providers.oauth2.views import OAuth2Adapter, OAuth2LoginView
 from django.conf import settings
 
+from tunnistamo.upstream import PooledOAuth2CallbackView
+
 from .provider import YleTunnusProvider
 
 
@@ -23,4 +25,4 @@ class YleTunnusOAuth2Adapter(OAuth2Adapter):
 
 
 oauth2_login = OAuth2LoginView.adapter_view(YleTunnusOAuth2Adapter)
-oauth2_callback = OAuth2CallbackView.adapter_view(YleTunnusOAuth2Adapter)
+oauth2_callback = PooledOAuth2CallbackView.adapter_view(YleTunnusOAuth2Adapter)